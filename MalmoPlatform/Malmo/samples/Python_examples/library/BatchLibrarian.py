@@ -0,0 +1,173 @@
+"""
+    Vectorized Librarian, steps N simulated (headless) environments at once with stacked NumPy state
+"""
+
+import numpy
+from gym.spaces import Discrete, Box
+
+from CostModel import CostModel
+from RetrievalPlanner import RetrievalPlanner
+
+
+class ChestCounts:
+    """
+        The (chest, item) counts of one env seen as a ChestStore by the RetrievalPlanner, items are mapping ids
+    """
+    __slots__ = ('counts',)
+
+    def __init__(self, counts):
+        self.counts = counts
+
+    def chests(self, item_id):
+        return numpy.flatnonzero(self.counts[:, item_id]).tolist()
+
+    def count(self, chest, item_id):
+        return int(self.counts[chest, item_id])
+
+
+class BatchLibrarian:
+    def __init__(self, env_config, num_envs):
+        # Same env_config as the Librarian, only the simulated (non display) parts are used
+        self.num_envs = num_envs
+        self._env_items = env_config['items']
+        self.obs_size = env_config['chestNum']
+        self.map = env_config['mapping']
+        self.rMap = env_config['rmapping']
+        self.max_items_per_chest = env_config['max_per_chest']
+        self._stochasticFailure = env_config['_stochasticFailure']
+        self._requester = env_config['requester']
+        self._costs = CostModel(self.obs_size, env_config.get('layout'))
+        self._planner = RetrievalPlanner(env_config.get('planner', 'greedy'), self._costs)
+
+        # Data saves, optional for the batch environment
+        self.returnData = env_config.get('returnData', [])
+        self.stepData = env_config.get('stepData', [])
+        self.failureData = env_config.get('failureData', [])
+
+        n_items = len(self._env_items)
+        # Stacks (of 64) to place, in the same order as the simulated inventory of the Librarian
+        stacks = []
+        for item, count in self._env_items.items():
+            stacks += [self.map[item]] * -(-count // 64)
+        self._stacks = numpy.array(stacks, dtype=numpy.int64)
+
+        self._envs = numpy.arange(num_envs)
+        # obs[env, chest, slot, item], chest 0 holds the item currently being placed
+        self._flat_obs = numpy.zeros(shape=(num_envs, (self.obs_size + 1) * self.max_items_per_chest * n_items),
+                                     dtype=numpy.float32)
+        self.obs = self._flat_obs.reshape((num_envs, self.obs_size + 1, self.max_items_per_chest, n_items))
+        # Return a read-only view of the buffer rather than a copy, only safe if the caller copies what it keeps
+        self._obs_view = env_config.get('_obs_view', False)
+        # Next open slot per chest, and number of each item per chest (chest index 0 is chest #1)
+        self._chestFill = numpy.zeros(shape=(num_envs, self.obs_size + 1), dtype=numpy.int64)
+        self._chestCounts = numpy.zeros(shape=(num_envs, self.obs_size, n_items), dtype=numpy.int64)
+        # Index into self._stacks of the item being placed per env
+        self._cursor = numpy.zeros(shape=num_envs, dtype=numpy.int64)
+        self.action_counts = numpy.zeros(shape=self.obs_size + 1, dtype=numpy.int64)
+
+        self.action_space = Discrete(self.obs_size)
+        self.observation_space = Box(0, 1,
+                                     shape=((self.obs_size + 1) * self.max_items_per_chest * n_items,),
+                                     dtype=numpy.float32)
+
+    def _reset_envs(self, envs):
+        self.obs[envs] = 0
+        self._chestFill[envs] = 0
+        self._chestCounts[envs] = 0
+        self._cursor[envs] = 0
+        self.obs[envs, 0, 0, self._stacks[0]] = 1
+
+    def _observation(self):
+        if not self._obs_view:
+            return self._flat_obs.copy()
+        view = self._flat_obs.view()
+        view.flags.writeable = False
+        return view
+
+    def reset(self):
+        """
+        Resets every environment.
+
+        Returns
+            observation: <np.array> (num_envs, observation size) initial observations
+        """
+        self._reset_envs(self._envs)
+        return self._observation()
+
+    def _retrieve(self, env, request):
+        """
+            Simulated Librarian._optimal_retrieve against the chest counts of a single env, planned by the same
+            RetrievalPlanner, request is a count vector indexed by the mapping. Returns the retrieved count vector and
+            the steps taken
+        """
+        to_retrieve = {item: num_retrieve for item, num_retrieve in enumerate(request.tolist()) if num_retrieve > 0}
+        action_plan, retrieved = self._planner.plan(to_retrieve, ChestCounts(self._chestCounts[env]),
+                                                    self._stochasticFailure)
+        result = numpy.zeros(shape=len(request), dtype=numpy.int64)
+        for item, num_retrieved in retrieved.items():
+            result[item] = num_retrieved
+        # Take the stacks out of the observation, last slot first as the Librarian's store does, so the terminal
+        #   observation is the Librarian's
+        obs = self.obs[env]
+        for chest, query in action_plan:
+            for item, num_retrieved in query.items():
+                obs[chest + 1, numpy.flatnonzero(obs[chest + 1, :, item])[::-1][:num_retrieved], item] = 0
+        # Walk through the chests in order and back, opening and closing a chest per action
+        chests = [chest for chest, _ in action_plan]
+        return result, self._costs.tour(chests) + self._costs.visit_cost * len(chests)
+
+    def step(self, actions):
+        """
+        Take one action in every environment. Finished environments are reset automatically, the observation
+        returned for them is the first one of the next episode.
+
+        Args
+            actions: <np.array> (num_envs,) index of the action to take per environment
+
+        Returns
+            observation: <np.array> (num_envs, observation size) observations
+            reward: <np.array> (num_envs,) reward from taking the actions
+            done: <np.array> (num_envs,) indicates terminal states
+            info: <list> dictionary of extra information per environment
+        """
+        actions = numpy.asarray(actions, dtype=numpy.int64)
+        positions = numpy.where(actions == 0, self.obs_size, actions)
+        self.action_counts += numpy.bincount(positions, minlength=self.obs_size + 1)
+
+        slots = self._chestFill[self._envs, positions]
+        placed = slots < self.max_items_per_chest
+        rewards = numpy.where(placed, 0, -5).astype(numpy.float64)
+        dones = numpy.zeros(shape=self.num_envs, dtype=bool)
+        infos = [{} for _ in range(self.num_envs)]
+
+        envs = self._envs[placed]
+        positions = positions[placed]
+        items = self._stacks[self._cursor[envs]]
+        self.obs[envs, positions, slots[placed], items] = 1
+        self._chestFill[envs, positions] += 1
+        self._chestCounts[envs, positions - 1, items] += 1
+        # clear since item has been placed, and set the next item to be placed
+        self.obs[envs, 0, 0] = 0
+        self._cursor[envs] += 1
+        dones[envs] = self._cursor[envs] == len(self._stacks)
+        going = envs[~dones[envs]]
+        self.obs[going, 0, 0, self._stacks[self._cursor[going]]] = 1
+
+        finished = numpy.flatnonzero(dones)
+        if len(finished):
+            to_retrieve = self._requester.get_requests(len(finished), self.map)
+            retrieved = numpy.zeros_like(to_retrieve)
+            scores = numpy.zeros(shape=len(finished), dtype=numpy.int64)
+            for i, env in enumerate(finished):
+                retrieved[i], scores[i] = self._retrieve(env, to_retrieve[i])
+            finished_rewards, failed = self._requester.get_rewards(to_retrieve, retrieved, scores)
+            rewards[finished] = finished_rewards
+            for i, env in enumerate(finished):
+                infos[env] = {'steps': int(scores[i]), 'failed': int(failed[i]),
+                              'terminal_observation': self._flat_obs[env].copy()}
+            self.returnData.extend(finished_rewards.tolist())
+            self.stepData.extend(scores.tolist())
+            self.failureData.extend(failed.tolist())
+            self._reset_envs(finished)
+
+        return self._observation(), rewards, dones, infos
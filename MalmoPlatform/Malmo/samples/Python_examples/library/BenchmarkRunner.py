@@ -0,0 +1,99 @@
+"""
+    Runs the benchmark over a grid of scenarios (failure vectors x item distributions) x seeds x episode counts on a
+    process pool, and aggregates every run into one report.
+"""
+import json
+import os
+import random
+import sys
+from itertools import product
+from multiprocessing import Pool
+
+import numpy
+
+from Benchmark import BenchMark, PLACEMENTS
+from Requester import Requester
+
+# Percentage for failure to open in a chest
+FAILURES = {
+    'best': [0.010020667324609045, 0.06541976810436156, 0.014450713025995533, 0.05572127466323378,
+             0.04338720075449303, 0.007890235534481071, 0.01715813232043357, 0.618243240812539, 0.7805985575324255,
+             0.30471561338685693],
+    'medium': [0.010020667324609045, 0.7805985575324255, 0.618243240812539, 0.06541976810436156,
+               0.014450713025995533, 0.05572127466323378, 0.04338720075449303, 0.007890235534481071,
+               0.01715813232043357, 0.30471561338685693],
+    'worst': [0.7805985575324255, 0.010020667324609045, 0.618243240812539, 0.06541976810436156,
+              0.014450713025995533, 0.05572127466323378, 0.04338720075449303, 0.007890235534481071,
+              0.01715813232043357, 0.30471561338685693],
+}
+# Placement policies of the benchmark, by the expected share of each item in the requests or as if every item was as
+#   likely
+DISTRIBUTIONS = tuple(PLACEMENTS)
+REQUESTER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "requester.json")
+
+
+def run_benchmark(task):
+    """
+        task: (failure scenario, distribution, seed, episodes), returns the per episode rewards, steps and failures
+    """
+    scenario, distribution, seed, episodes = task
+    random.seed(seed)
+    numpy.random.seed(seed)
+    req = Requester(None, None, None, REQUESTER_PATH)
+    mark = BenchMark(req.request_distribution(), FAILURES[scenario], distribution)
+
+    rewards = numpy.zeros(shape=episodes, dtype=numpy.float64)
+    steps = numpy.zeros(shape=episodes, dtype=numpy.float64)
+    failures = numpy.zeros(shape=episodes, dtype=numpy.float64)
+    for episode in range(episodes):
+        mark.reset()
+        newReq = req.get_request()
+        result, steps[episode] = mark.optimal_retrieve(newReq)
+        rewards[episode], failures[episode] = req.get_reward(newReq, result, steps[episode])
+    return task, rewards, steps, failures
+
+
+def run_grid(scenarios=tuple(FAILURES), distributions=DISTRIBUTIONS, seeds=range(10), episodes=(100,),
+             processes=None):
+    """
+        Run every combination on a pool of `processes` (default one per core) and aggregate them, returns the report
+        as a list of one dict per (scenario, distribution, episodes) with the mean and standard deviation over seeds
+    """
+    tasks = list(product(scenarios, distributions, seeds, episodes))
+    with Pool(processes) as pool:
+        results = pool.map(run_benchmark, tasks, chunksize=max(1, len(tasks) // (4 * (processes or os.cpu_count()))))
+
+    runs = {}
+    for (scenario, distribution, seed, count), rewards, steps, failures in results:
+        runs.setdefault((scenario, distribution, count), []).append([rewards.mean(), steps.mean(), failures.mean()])
+    report = []
+    for (scenario, distribution, count), values in runs.items():
+        values = numpy.array(values)
+        mean, std = values.mean(axis=0), values.std(axis=0)
+        report.append({'scenario': scenario, 'distribution': distribution, 'episodes': count, 'seeds': len(values),
+                       'reward': mean[0], 'reward_std': std[0], 'steps': mean[1], 'steps_std': std[1],
+                       'failures': mean[2], 'failures_std': std[2]})
+    return report
+
+
+def print_report(report):
+    print(f"{'scenario':<8} {'distribution':<12} {'episodes':>8} {'seeds':>5} {'reward':>16} {'steps':>16} "
+          f"{'failures':>14}")
+    for row in report:
+        print(f"{row['scenario']:<8} {row['distribution']:<12} {row['episodes']:>8} {row['seeds']:>5} "
+              f"{row['reward']:>8.2f} ±{row['reward_std']:>6.2f} {row['steps']:>8.2f} ±{row['steps_std']:>6.2f} "
+              f"{row['failures']:>6.3f} ±{row['failures_std']:>6.3f}")
+
+
+if __name__ == '__main__':
+    # python BenchmarkRunner.py [report path]
+    SEEDS = range(10)
+    EPISODES = (100,)
+    report_path = sys.argv[1] if len(sys.argv) > 1 else "benchmark/report.json"
+
+    report = run_grid(seeds=SEEDS, episodes=EPISODES)
+    print_report(report)
+    os.makedirs(os.path.dirname(report_path) or '.', exist_ok=True)
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"REPORT SAVED AT: {report_path}")
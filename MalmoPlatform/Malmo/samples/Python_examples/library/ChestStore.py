@@ -0,0 +1,126 @@
+"""
+    Contents of the chests as arrays: the item id held by every slot of every chest, and per item a bitmask of the
+    chests holding it, optionally kept in sync with a one-hot encoding (the Librarian's observation). Saving and
+    restoring a placement is a copy of the arrays.
+"""
+import numpy
+
+EMPTY = -1
+
+
+class ChestStore:
+    __slots__ = ('ids', 'items', 'slots', 'masks', 'onehot', '_full', '_free', '_held')
+
+    def __init__(self, chest_num, slots_per_chest, items, onehot=None):
+        """
+            items: dict of item to id (e.g. the Librarian's mapping), or a list of items numbered in order
+            onehot: optional (chest_num, slots_per_chest, number of items) array, e.g. a view of an observation, kept
+                as the one-hot encoding of the slots
+        """
+        self.ids = dict(items) if isinstance(items, dict) else {item: i for i, item in enumerate(items)}
+        self.items = [item for item, _ in sorted(self.ids.items(), key=lambda x: x[1])]
+        # slots[chest, slot] = id of the item in it, EMPTY if none
+        self.slots = numpy.full(shape=(chest_num, slots_per_chest), fill_value=EMPTY, dtype=numpy.int64)
+        # Bit c of masks[id] is set while chest c holds the item, python ints so any number of chests fits
+        self.masks = [0] * len(self.items)
+        # Per chest, slot bitmasks of its empty slots and of the slots holding every item, so finding, filling and
+        #   emptying slots is constant time and allocates no arrays
+        self._full = (1 << slots_per_chest) - 1
+        self._free = [self._full] * chest_num
+        self._held = [[0] * len(self.items) for _ in range(chest_num)]
+        self.onehot = onehot
+        if onehot is not None:
+            self._encode()
+
+    def _encode(self):
+        self.onehot.fill(0)
+        chests, slots = numpy.nonzero(self.slots != EMPTY)
+        self.onehot[chests, slots, self.slots[chests, slots]] = 1
+
+    def clear(self):
+        self.slots.fill(EMPTY)
+        self.masks[:] = [0] * len(self.masks)
+        self._free[:] = [self._full] * len(self._free)
+        for held in self._held:
+            held[:] = [0] * len(held)
+        if self.onehot is not None:
+            self.onehot.fill(0)
+
+    def snapshot(self):
+        return self.slots.copy(), list(self.masks), list(self._free), [list(held) for held in self._held]
+
+    def restore(self, snapshot):
+        slots, masks, free, held = snapshot
+        numpy.copyto(self.slots, slots)
+        self.masks[:] = masks
+        self._free[:] = free
+        for current, saved in zip(self._held, held):
+            current[:] = saved
+        if self.onehot is not None:
+            self._encode()
+
+    def place(self, chest, slot, item):
+        """
+            Put the item in an empty slot of the chest
+        """
+        item_id = self.ids[item]
+        self.slots[chest, slot] = item_id
+        self._free[chest] &= ~(1 << slot)
+        self._held[chest][item_id] |= 1 << slot
+        self.masks[item_id] |= 1 << chest
+        if self.onehot is not None:
+            self.onehot[chest, slot, item_id] = 1
+
+    def free_slot(self, chest):
+        """
+            First empty slot of the chest, None if it is full
+        """
+        free = self._free[chest]
+        return (free & -free).bit_length() - 1 if free else None
+
+    def chests(self, item):
+        """
+            Sorted indices of the chests holding the item
+        """
+        mask = self.masks[self.ids[item]]
+        chests = []
+        while mask:
+            low = mask & -mask
+            chests.append(low.bit_length() - 1)
+            mask ^= low
+        return chests
+
+    def count(self, chest, item):
+        return bin(self._held[chest][self.ids[item]]).count('1')
+
+    def take(self, chest, item, num):
+        """
+            Empty up to num slots of the chest holding the item, last slot first, returns the slots emptied
+        """
+        item_id = self.ids[item]
+        held = self._held[chest][item_id]
+        taken = []
+        while held and len(taken) < num:
+            slot = held.bit_length() - 1
+            held ^= 1 << slot
+            self._free[chest] |= 1 << slot
+            self.slots[chest, slot] = EMPTY
+            if self.onehot is not None:
+                self.onehot[chest, slot, item_id] = 0
+            taken.append(slot)
+        self._held[chest][item_id] = held
+        if not held:
+            self.masks[item_id] &= ~(1 << chest)
+        return taken
+
+    def contents(self):
+        """
+            Per chest, dict of {key: item, value: list of slots holding it}, for printing
+        """
+        contents = []
+        for chest in self.slots:
+            held = {}
+            for slot in numpy.flatnonzero(chest != EMPTY):
+                held.setdefault(self.items[chest[slot]], []).append(int(slot))
+            contents.append(held)
+        return contents
@@ -0,0 +1,38 @@
+"""
+    Queue of Malmo commands sent together. Primitives (moves, chest use, swaps) are queued and only flushed where the
+    caller needs their effect, with a single wait per flush instead of one per command.
+"""
+import time
+
+
+class CommandBatcher:
+    def __init__(self, agent, interval=0):
+        self.agent = agent
+        # Wait after a flush
+        self.interval = interval
+        self._queue = []
+        # Commands sent and number of non empty flushes
+        self.sent = 0
+        self.flushes = 0
+
+    def __len__(self):
+        return len(self._queue)
+
+    def queue(self, command, repeat=1):
+        self._queue.extend([command] * repeat)
+
+    def flush(self):
+        """
+            Send every queued command in order, then wait once
+        """
+        if not self._queue:
+            return 0
+        for command in self._queue:
+            self.agent.sendCommand(command)
+        sent = len(self._queue)
+        self._queue = []
+        self.sent += sent
+        self.flushes += 1
+        if self.interval:
+            time.sleep(self.interval)
+        return sent
@@ -0,0 +1,51 @@
+"""
+    Step costs of the library, distances between every pair of agent positions are computed once
+"""
+import numpy
+
+
+class CostModel:
+    def __init__(self, chest_num, layout=None):
+        """
+            chest_num: number of chests, the agent moves between positions -1 (exit), 0 (delivery chest) and
+                1..chest_num (the chests)
+            layout: optional list of (x, z) block coordinates of chests 1..chest_num, defaults to the line of
+                chests every 2 blocks along x used by the mission
+        """
+        self.chest_num = chest_num
+        self.is_linear = layout is None
+        if layout is None:
+            layout = [(2 * chest, 0) for chest in range(1, chest_num + 1)]
+        if len(layout) != chest_num:
+            raise ValueError(f"Layout has {len(layout)} positions for {chest_num} chests")
+        # Exit (iron block) and delivery chest, then the chests
+        coordinates = numpy.array([(-2, 0), (0, 0)] + [tuple(position) for position in layout], dtype=numpy.int64)
+
+        # distance[a + 1, b + 1] = discrete moves from position a to position b
+        self.distance = numpy.abs(coordinates[:, None, :] - coordinates[None, :, :]).sum(axis=2)
+        # Plain lists for the per step scalar lookups, indexing numpy arrays one value at a time is slower
+        self._rows = self.distance.tolist()
+
+        self.open_cost = 1
+        self.close_cost = 1
+        self.visit_cost = self.open_cost + self.close_cost
+
+    def move(self, position, destination):
+        return self._rows[position + 1][destination + 1]
+
+    def round_trip(self, chests):
+        """
+            Steps from the delivery chest to chest index (0 = chest #1) and back, chests may be an array
+        """
+        chests = numpy.asarray(chests, dtype=numpy.int64) + 2
+        return self.distance[1, chests] + self.distance[chests, 1]
+
+    def tour(self, chests):
+        """
+            Steps to visit the chest indices in ascending order from the delivery chest and come back, not counting
+            openings
+        """
+        if len(chests) == 0:
+            return 0
+        path = numpy.concatenate(([1], numpy.sort(numpy.asarray(chests, dtype=numpy.int64)) + 2, [1]))
+        return int(self.distance[path[:-1], path[1:]].sum())
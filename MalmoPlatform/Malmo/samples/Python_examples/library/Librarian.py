@@ -1,14 +1,12 @@
+import copy
 import json
 import time
-from random import random, randint
 
 import numpy
 import os
 
-import gym, ray
+import gym
 from gym.spaces import Discrete, Box
-import matplotlib.pyplot as plt
-from ray.rllib.agents import ppo
 import sys
 
 try:
@@ -16,22 +14,62 @@ try:
 except ModuleNotFoundError:
     print("no setup found, ignoring")
 
+# Malmo is only needed by the 'malmo' backend, the headless backend runs without a Minecraft client installed
 try:
     from malmo import MalmoPython
 except ImportError:
-    import MalmoPython
+    try:
+        import MalmoPython
+    except ImportError:
+        MalmoPython = None
 
-import matplotlib
+from LogWriter import LogWriter
+from MetricsStore import MetricsStore, MetricBuffer, worker_directory, merge
+from OnlineStats import RunningMean, StreamingHistogram
 from Requester import Requester
+from RetrievalPlanner import RetrievalPlanner
+from ChestStore import ChestStore
+from CostModel import CostModel
+from MissionBuilder import reset_commands, start_inventory
+from ObservationWatcher import ObservationWatcher, inventory_holds, at
+from LibraryCore import LibraryCore
+from CommandBatcher import CommandBatcher
+from ObservationDecoder import ObservationDecoder
 
-matplotlib.use('TKAgg')
+BACKENDS = ('malmo', 'headless')
 
 
-class Librarian(gym.Env):
+class Librarian(gym.Env, LibraryCore):
     def __init__(self, env_config):
-        self.agent = MalmoPython.AgentHost()
         # env_config contains info, including items, etc.
 
+        # 'malmo' drives a Minecraft client through MalmoPython, 'headless' simulates every action in-process
+        self._backend = env_config.get('backend', 'malmo')
+        if self._backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{self._backend}', expected one of {BACKENDS}")
+        # For quick training
+        self._display = env_config.get('_display', False)
+        self._print_logs = env_config.get('_print_logs', False)
+        self._sleep_interval = env_config.get('_sleep_interval', 0)
+        # Keep one mission alive and restore it in place between episodes rather than restarting Malmo every episode
+        self._reuse_mission = env_config.get('_reuse_mission', False)
+        # A restored mission is confirmed within '_reset_timeout' seconds, or a new one is started
+        self._reset_timeout = env_config.get('_reset_timeout', 5)
+        if self._backend == 'headless':
+            if self._display:
+                raise ValueError("The headless backend cannot display, set '_display' to False")
+            self.agent = None
+        else:
+            if MalmoPython is None:
+                raise ImportError("MalmoPython is required by the 'malmo' backend, use backend 'headless' instead")
+            self.agent = MalmoPython.AgentHost()
+        # Observations are polled every '_observation_interval' seconds, a swap is confirmed within '_swap_timeout'
+        self._watcher = None if self.agent is None else \
+            ObservationWatcher(self.agent, env_config.get('_observation_interval', .05))
+        self._swap_timeout = env_config.get('_swap_timeout', 1)
+        # Primitive commands are queued and sent together, waiting '_sleep_interval' once per batch
+        self._commands = CommandBatcher(self.agent, self._sleep_interval)
+
         # These are the dict of items that are to be distributed, key = item; value = number of item
         self._env_items = env_config['items']
         # number of chests
@@ -40,37 +78,77 @@ class Librarian(gym.Env):
         self.map = env_config['mapping']
         # reverse mapping
         self.rMap = env_config['rmapping']
+        self._decoder = ObservationDecoder(self.map)
         # maximum items per chest to enqable
         self.max_items_per_chest = env_config['max_per_chest']
 
-        # Contents of chests key = item; value = set of items positions
-        self._itemPos = {}
+        # Step costs, optionally of a non linear library given as the (x, z) position of every chest
+        self._costs = CostModel(self.obs_size, env_config.get('layout'))
+        if self._display and not self._costs.is_linear:
+            raise ValueError("Only the linear library can be displayed")
+        # 'greedy' retrieves farthest first per item, 'exact' plans the fewest steps for the whole request
+        self._planner = RetrievalPlanner(env_config.get('planner', 'greedy'), self._costs)
         self._placingInventory = []
-        self._chestContents = []
-
-        # Ideas: record next open slot per chest
-        self._chestPosition = []
+        # First slot of the simulated inventory that may still hold an item, it is emptied in order
+        self._placingNext = 0
         # Percentage for failure to open in a chest
         self._stochasticFailure = env_config['_stochasticFailure']
         self._inventory = {}
         self._nextOpen = 0
         self._log_freq = 10
         self.directory = env_config['directoryName']
+        # Under RLlib env_config is an EnvContext. The environments of rollout workers (worker_index > 0) and every
+        #   further environment of a worker keep their own requester and metrics store, the driver merges the stores
+        #   with MetricsStore.merge. The local worker's environment (worker_index 0) keeps the run's own directory.
+        worker_index = getattr(env_config, 'worker_index', 0)
+        vector_index = getattr(env_config, 'vector_index', 0)
+        self._parallel = worker_index > 0 or vector_index > 0
+        if self._parallel:
+            self.directory = worker_directory(self.directory, worker_index, vector_index)
+            os.makedirs(self.directory, exist_ok=True)
+        # Plots and histories are written by a background thread unless '_async_log' is False
+        self._logWriter = LogWriter(self.directory, env_config.get('_async_log', True))
         # model params
-        self.action_tracker = {}
+        # Per action (chest) counts and running statistics of the training curves, constant time per episode
+        self.action_tracker = numpy.zeros(shape=self.obs_size + 1, dtype=numpy.int64)
+        self._returnMean = RunningMean(self._log_freq)
+        self._stepMean = RunningMean(self._log_freq)
+        self._returnHistogram = StreamingHistogram(*env_config.get('_reward_bins', (-100, 150, 25)))
+        self._stepHistogram = StreamingHistogram(*env_config.get('_step_bins', (0, 200, 20)))
+        # Smoothed values since the last log, the log writer appends them to the metrics store
+        self._smoothed = {'smoothReturns': [], 'smoothSteps': []}
         self._episode_score = 0
         self.agent_position = 0
         self.episode_number = 0
 
         # Data saves
-        self.returnData = env_config['returnData']
-        self.stepData = env_config['stepData']
-        self.itemData = env_config['itemData']
-        self.failureData = env_config['failureData']
+        # The histories given in env_config only seed bounded ring buffers, whatever is not in the metrics store
+        #   yet is spilled to it through the log writer, so memory stays constant however long training runs
+        capacity = env_config.get('_metric_capacity', 1024)
+        histories = {}
+        for name, key in (('returns', 'returnData'), ('steps', 'stepData'), ('failures', 'failureData')):
+            # Parallel environments start empty, the past histories are in the driver's merged store
+            history = [] if self._parallel else env_config[key]
+            # The first entry of a history is never stored, nor is what is already in the store (e.g. a history
+            #   loaded back from it)
+            stored = 1 + min(self._logWriter.store.length(name), max(0, len(history) - 1))
+            histories[name] = MetricBuffer(capacity, self._spiller(name), history, stored)
+        self.returnData = histories['returns']
+        self.stepData = histories['steps']
+        self.failureData = histories['failures']
+        self.itemData = copy.deepcopy(env_config['itemData']) if self._parallel else env_config['itemData']
 
         self.inv_number = 0
         self.item = 0
-        self.obs = numpy.zeros(shape=(self.obs_size + 1, self.max_items_per_chest, len(self._env_items)))
+        # Single preallocated observation buffer (dtype of the observation_space), self.obs is a reshaped view of it
+        self._flat_obs = numpy.zeros(shape=((self.obs_size + 1) * self.max_items_per_chest * len(self._env_items),),
+                                     dtype=numpy.float32)
+        self.obs = self._flat_obs.reshape((self.obs_size + 1, self.max_items_per_chest, len(self._env_items)))
+        # Single model of the chests (without the delivery chest, obs[0]): item ids per slot, the chests holding every
+        #   item, and their one-hot encoding written straight into the observation. Item ids are the mapping's
+        self._store = ChestStore(self.obs_size, self.max_items_per_chest, self.map, self.obs[1:])
+        # Return a read-only view of the buffer rather than a copy, only safe if the caller copies what it keeps
+        self._obs_view = env_config.get('_obs_view', False)
         self.world_obs = None
         self.heatmap = numpy.zeros(shape=(len(self._env_items), self.obs_size))
         # self._input_dist = sorted(numpy.random.random((len(self._env_items),)))
@@ -80,68 +158,30 @@ class Librarian(gym.Env):
         self.observation_space = Box(0, 1,
                                      shape=((self.obs_size + 1) * self.max_items_per_chest * len(self._env_items),),
                                      dtype=numpy.float32)
-        # For quick training
-        self._display = env_config['_display']
-        self._print_logs = env_config['_print_logs']
-        self._sleep_interval = env_config['_sleep_interval']
 
         #  todo code class for requester
         # nondeterm situation occuring when get reward at times
-        self._requester = env_config['requester']
+        self._requester = copy.deepcopy(env_config['requester']) if self._parallel else env_config['requester']
+
+    def _spiller(self, name):
+        return lambda values: self._logWriter.submit({'episode_number': self.episode_number, 'full': False,
+                                                      'new': {name: values}, 'plot': False})
+
+    def _record_retrieval(self, score, failed):
+        self.stepData.append(score)
+        self.failureData.append(failed)
+        self._stepHistogram.update(score)
+        self._smoothed['smoothSteps'].append(self._stepMean.update(score))
 
-    def _optimal_retrieve(self, input: dict):
+    def _observation(self):
         """
-            input: dict of objects to retrieve in format of {key: object_id, value: number to retrieve}
-            Assumed that the self._itemPos is properly updated and kept done well
+            Flattened observation, either a copy or a read-only view of the observation buffer
         """
-        if self._print_logs:
-            print(self._itemPos)
-            print(self._chestContents)
-        action_plan = []
-        result = {}
-        for item_id, num_retrieve in input.items():
-            if len(self._itemPos[item_id]) > 0:
-                # Therefore can retrieve, else you dun messed up
-                pq_items = sorted([i for i in self._itemPos[item_id]])
-                if self._print_logs:
-                    print(self._itemPos)
-                    print(self._chestContents)
-                    print(pq_items)
-                    print(num_retrieve)
-                    print(item_id)
-                # Now we pop until we find
-                while num_retrieve > 0 and len(pq_items) > 0:
-                    toConsider = pq_items.pop()
-                    if random() < self._stochasticFailure[toConsider]:
-                        continue
-                    chest = self._chestContents[toConsider]
-                    if num_retrieve <= len(chest[item_id]):
-                        toRetrieve = num_retrieve
-                    else:
-                        toRetrieve = len(chest[item_id])
-                    action_plan.append((toConsider, item_id, toRetrieve))
-                    if item_id not in result:
-                        result[item_id] = 0
-                    result[item_id] += toRetrieve
-                    num_retrieve -= toRetrieve
-
-        action_plan = sorted(action_plan, key=lambda x: x[0])  # Sort by the first elemetn in the tuple
-        score = 0
-        for position, item, num_retrieve in action_plan:
-            # Should be in order from closest to furthest and retreiving the items so we should be able to execute
-            #   from here
-            score += self.moveToChest(position + 1)
-            score += self.openChest()
-            self.getItems({item: num_retrieve})
-            score += self.closeChest()
-        score += self.moveToChest(0)
-        if self._display:
-            score += self.openChest()
-            # Max position item should be at
-            for i in range(self._nextOpen):
-                self.invAction("swap", i, i)
-            score += self.closeChest()
-        return result, score
+        if not self._obs_view:
+            return self._flat_obs.copy()
+        view = self._flat_obs.view()
+        view.flags.writeable = False
+        return view
 
     def step(self, action):
         """
@@ -165,269 +205,105 @@ class Librarian(gym.Env):
             print(self.item)
         if action == 0:
             action = self.obs_size
-        if action not in self.action_tracker:
-            self.action_tracker[action] = 0
         self.action_tracker[action] += 1
         
         reward = 0
-        if self._display:
-            time.sleep(self._sleep_interval)
         self.moveToChest(action)
         self.openChest()
 
         placed = False
-        # new observation
-        for i, x in enumerate(self.obs[self.agent_position]):
-            if not any(self.obs[self.agent_position][i]):
-                if self._print_logs:
-                    print(self.obs[self.agent_position][i])
-                if self._display:
-                    self.invAction("swap", self.inv_number, i)
-                self.obs[self.agent_position][i][self.item] = 1
-                self._itemPos[self.rMap[self.item]].add(self.agent_position - 1)
-                self._chestContents[self.agent_position - 1][self.rMap[self.item]].append(i)
-                self.heatmap[self.item][self.agent_position-1] += 1/ (self._env_items[self.rMap[self.item]]/64)
-
-                # clear since item has been placed
-                self.obs[0][0] = numpy.zeros(shape=len(self._env_items))
-                placed = True
-                break
+        # new observation, the store also encodes the item in self.obs
+        i = self._store.free_slot(self.agent_position - 1)
+        if i is not None:
+            if self._print_logs:
+                print(self.obs[self.agent_position][i])
+            if self._display:
+                self.invAction("swap", self.inv_number, i)
+            self._store.place(self.agent_position - 1, i, self.rMap[self.item])
+            self.heatmap[self.item][self.agent_position-1] += 1/ (self._env_items[self.rMap[self.item]]/64)
 
-        if self._display:
-            time.sleep(1)
+            # clear since item has been placed
+            self.obs[0][0] = 0
+            placed = True
 
         self.closeChest()
         done = False
         if placed:
             if self._display:
                 if self.world_obs:
-                    for x in self.world_obs:
-                        if "Inventory" in x and "item" in x:
-                            if self.world_obs[x] != 'air':
-                                self.inv_number = int(x.split("_")[1])
-                                self.item = self.map[self.world_obs[x]]
-                                # set next item to be place
-                                self.obs[0][0][self.item] = 1
-                                break
+                    if self._nextItem():
+                        # set next item to be place
+                        self.obs[0][0][self.item] = 1
                     else:
-                        # if for loop doesn't break that means only air was found we are done and compute final reward
+                        # only air was found, we are done and compute final reward
                         done = True
                         self.moveToChest(0)
                         to_retrieve = self._requester.get_request()
                         retrieved_items, score = self._optimal_retrieve(to_retrieve)
                         reward, failed = self._requester.get_reward(to_retrieve, retrieved_items, score)
-                        self.stepData.append(score)
-                        self.failureData.append(failed)
+                        self._record_retrieval(score, failed)
             else:
                 # simulated inventory
-                for i, x in enumerate(self._placingInventory):
-                    if x != -1:
-                        self.item = x
-                        self.inv_number = i
-                        self._placingInventory[i] = -1
-                        self.obs[0][0][self.item] = 1
-                        break
+                if self._nextPlacingItem():
+                    self.obs[0][0][self.item] = 1
                 else:
                     done = True
                     self.moveToChest(0)
                     to_retrieve = self._requester.get_request()
                     retrieved_items, score = self._optimal_retrieve(to_retrieve)
                     reward, failed = self._requester.get_reward(to_retrieve, retrieved_items, score)
-                    self.stepData.append(score)
-                    self.failureData.append(failed)
+                    self._record_retrieval(score, failed)
         else:
-            return self.obs.flatten(), -5, done, dict()
+            self._commands.flush()
+            return self._observation(), -5, done, dict()
         if self._print_logs:
             print(self.obs)
         if done:
-            # end malmo mission
-            self.moveToChest(-1)
             self._episode_score += reward
-            done = not self._display
-            while not done:
-                world_state = self.agent.getWorldState()
-                for error in world_state.errors:
-                    print("Error:", error.text)
-                done = not world_state.is_mission_running
-                time.sleep(self._sleep_interval)
+            if not self._reuse_mission:
+                # end malmo mission
+                self.moveToChest(-1)
+                self._commands.flush()
+                ended = not self._display
+                while not ended:
+                    world_state = self.agent.getWorldState()
+                    for error in world_state.errors:
+                        print("Error:", error.text)
+                    ended = not world_state.is_mission_running
+                    time.sleep(self._sleep_interval)
         if self._print_logs:
             print(done)
+        self._commands.flush()
 
         # 0 reward if no retrieve
-        return self.obs.flatten(), reward, done, dict()
-
-    def GetMissionXML(self):
-        leftX = self.obs_size * 2 + 2
-        front = f"<DrawCuboid x1='{leftX}' y1='0' z1='2' x2='-4' y2='10' z2='2' type='bookshelf' />"
-        right = f"<DrawCuboid x1='-4' y1='0' z1='2' x2='-4' y2='10' z2='-10' type='bookshelf' />"
-        left = f"<DrawCuboid x1='{leftX}' y1='0' z1='2' x2='{leftX}' y2='10' z2='-10' type='bookshelf' />"
-        back = f"<DrawCuboid x1='{leftX}' y1='0' z1='-10' x2='-4' y2='10' z2='-10' type='bookshelf' />"
-        floor = f"<DrawCuboid x1='{leftX}' y1='1' z1='-10' x2='-4' y2='1' z2='2' type='bookshelf' />"
-        libraryEnv = front + right + left + back + floor
-        item = f""
-        for items in self._env_items:
-            for x in range(self._env_items[items]):
-                item += f"<DrawItem x='0' y='3' z='1' type='{items}' />"
-        chests = f"<DrawBlock x='0' y='2' z='1' type='air' />" + \
-                 f"<DrawBlock x='0' y='2' z='1' type='chest' />"
-        for chest_num in range(self.obs_size):
-            chests += f"<DrawBlock x='{chest_num * 2 + 2}' y='2' z='1' type='air' />"
-            chests += f"<DrawBlock x='{chest_num * 2 + 2}' y='2' z='1' type='chest' />"
-            chests += f"<DrawBlock x='{chest_num * 2 + 2}' y='1' z='0' type='diamond_block' />"
-        chests += f"<DrawBlock x='0' y='2' z='1' type='chest' />"
-
-        return f'''<?xml version="1.0" encoding="UTF-8" standalone="no" ?>
-                        <Mission xmlns="http://ProjectMalmo.microsoft.com" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
-
-                            <About>
-                                <Summary>Librarian</Summary>
-                            </About>
-
-                            <ServerSection>
-                                <ServerInitialConditions>
-                                    <Time>
-                                        <StartTime>12000</StartTime>
-                                        <AllowPassageOfTime>false</AllowPassageOfTime>
-                                    </Time>
-                                    <Weather>clear</Weather>
-                                </ServerInitialConditions>
-                                <ServerHandlers>
-                                    <FlatWorldGenerator generatorString="3;7,2;1;"/>
-                                    <DrawingDecorator>
-                                        {libraryEnv}
-                                        {item}
-                                        {chests}
-                                        <DrawBlock x='-2' y='1' z='0' type='iron_block' />
-                                        <DrawBlock x='0' y='1' z='0' type='emerald_block' />
-                                    </DrawingDecorator>
-                                    <ServerQuitWhenAnyAgentFinishes/>     
-                                </ServerHandlers>
-                            </ServerSection>
-
-                            <AgentSection mode="Survival">
-                                <Name>Librarian</Name>
-                                <AgentStart>
-                                    <Placement x="0.5" y="3" z="0.5" pitch="40" yaw="0"/>
-                                    <Inventory>
-                                    </Inventory>
-                                </AgentStart>
-                                <AgentHandlers>
-                                    <ContinuousMovementCommands/>
-                                    <DiscreteMovementCommands/>
-                                    <ChatCommands/>
-                                    <ObservationFromFullStats/>
-                                    <InventoryCommands/>
-                                    <ObservationFromFullInventory/>
-                                    <ObservationFromRay/>
-                                    <ObservationFromGrid>
-                                        <Grid name="floorAll">
-                                            <min x="-{int(self.obs_size / 2)}" y="-1" z="-{int(self.obs_size / 2)}"/>
-                                            <max x="{int(self.obs_size / 2)}" y="0" z="{int(self.obs_size / 2)}"/>
-                                        </Grid>
-                                    </ObservationFromGrid>
-                                    <AgentQuitFromTouchingBlockType>
-                                        <Block type="iron_block"/>
-                                    </AgentQuitFromReachingPosition>
-
-                                </AgentHandlers>
-                            </AgentSection>
-                        </Mission>'''
-
-    def _updateObs(self):
-        if not self._display:
-            return
-        toSleep = .1
-        self.world_obs = None
-        while self.world_obs is None:
-            time.sleep(toSleep)
-            toSleep += .2
-            try:
-                cur_state = self.agent.getWorldState()
-                self.world_obs = json.loads(cur_state.observations[-1].text)
-            except IndexError:
-                print("retrying...")
-
-    # Primative move actions
-    def moveLeft(self, steps, force):
-        if self._display or force:
-            for i in range(steps):
-                self.agent.sendCommand("moveeast")
-                time.sleep(self._sleep_interval)
-        return steps
-
-    def moveRight(self, steps, force):
-        if self._display or force:
-            for i in range(steps):
-                self.agent.sendCommand("movewest")
-                time.sleep(self._sleep_interval)
-        return steps
-
-    def openChest(self):
-        if self._display:
-            self.agent.sendCommand("use 1")
-            time.sleep(self._sleep_interval)
-            self.agent.sendCommand("use 0")
-            time.sleep(self._sleep_interval)
-        return 1
-
-    def closeChest(self):
-        if self._display:
-            for _ in range(10):
-                self.agent.sendCommand("movenorth")
-            time.sleep(self._sleep_interval)
-            for _ in range(10):
-                self.agent.sendCommand("movesouth")
-            time.sleep(self._sleep_interval)
-        return 1
-
-    # Complex Move actions
-    def moveToChest(self, chest_num, force=False):
-
-        if self.agent_position == chest_num:
-            return 0
-        if chest_num != -1 and self._print_logs:
-            print(f"Moving to chest #{chest_num} ..")
-        if self.agent_position - chest_num < 0:
-            result = self.moveLeft(2 * abs(self.agent_position - chest_num), force)
-        else:
-            result = self.moveRight(2 * abs(self.agent_position - chest_num), force)
-        self.agent_position = chest_num
-        time.sleep(self._sleep_interval)
-        return result
-
-    def invAction(self, action, inv_index, chest_index):
-        self._updateObs()
-        if "inventoriesAvailable" in self.world_obs:
-            chestName = self.world_obs["inventoriesAvailable"][-1]['name']
-            self.agent.sendCommand(f"{action}InventoryItems {inv_index} {chestName}:{chest_index}")
-            time.sleep(self._sleep_interval)
-            self._updateObs()
+        return self._observation(), reward, done, dict()
 
-    def getItems(self, query):
+    def _nextPlacingItem(self):
         """
-            query = dict{ key = itemId: value = number to retrieve }
+            Take the first item left in the simulated inventory to place next, False if there is none
         """
-        chest = self._chestContents[self.agent_position - 1]
-        for itemId, toRetrieve in query.items():
-            for i in range(toRetrieve):
-                try:
-                    posToGet = chest[itemId].pop()
-                except IndexError:
-                    print("Bad retrieval, should not have happened, somewhere we did not update properly")
-                    break
-                # Create a new slot for this new item, and deposit there
-                if itemId not in self._inventory:
-                    self._inventory[itemId] = set()
-                self._inventory[itemId].add(self._nextOpen)
-                if self._display:
-                    self.invAction("swap", self._nextOpen, posToGet)
-                self._nextOpen += 1
-
-                time.sleep(self._sleep_interval)
-            # update if we have retrieved all said items within the chest
-            if len(chest[itemId]) == 0:
-                del self._chestContents[self.agent_position - 1][itemId]
-                self._itemPos[itemId].remove(self.agent_position - 1)
+        while self._placingNext < len(self._placingInventory):
+            i = self._placingNext
+            self._placingNext += 1
+            x = self._placingInventory[i]
+            if x != -1:
+                self.item = x
+                self.inv_number = i
+                self._placingInventory[i] = -1
+                return True
+        return False
+
+    def _nextItem(self):
+        """
+            Select the first inventory slot of the last observation holding an item to place, False if there is none
+        """
+        ids, _ = self._decoder.inventory(self.world_obs)
+        slots = numpy.flatnonzero(ids >= 0)
+        if len(slots) == 0:
+            return False
+        self.inv_number = int(slots[0])
+        self.item = int(ids[slots[0]])
+        return True
 
     def reset(self):
         """
@@ -439,12 +315,20 @@ class Librarian(gym.Env):
         # Reset Malmo
         self.episode_number += 1
         if self._display:
-            self.init_malmo()
-        time.sleep(1)
-        self.obs = numpy.zeros(shape=(self.obs_size + 1, self.max_items_per_chest, len(self._env_items)))
+            self._commands.flush()
+            # A running mission is restored in place, a new one is started if it cannot be
+            restored = self._reuse_mission and self.agent.getWorldState().is_mission_running and self.restore_mission()
+            if not restored:
+                self.init_malmo()
+                time.sleep(1)
+        self._flat_obs.fill(0)
         self.returnData.append(self._episode_score)
+        # The very first entry is not an episode
+        if self.episode_number > 1:
+            self._returnHistogram.update(self._episode_score)
+            self._smoothed['smoothReturns'].append(self._returnMean.update(self._episode_score))
         if self._print_logs:
-            print(self.returnData)
+            print(self.returnData.recent())
         if self.episode_number % self._log_freq == 0:
             self.log()
         self._episode_score = 0
@@ -452,20 +336,10 @@ class Librarian(gym.Env):
         self._placingInventory = []
         self._updateObs()
         if self._display:
-            for x in self.world_obs:
-                if "Inventory" in x and "item" in x:
-                    if self._display:
-                        if self.world_obs[x] != 'air':
-                            self.inv_number = int(x.split("_")[1])
-                            self.item = self.map[self.world_obs[x]]
-                            break
-                    else:
-                        if self.world_obs[x] in self.map:
-                            self._placingInventory.append(self.map[self.world_obs[x]])
-                        else:
-                            self._placingInventory.append(-1)
+            self._nextItem()
         else:
             self._placingInventory = [-1] * 40
+            self._placingNext = 0
             pos = 0
             for i in self._env_items:
                 toPlace = self._env_items[i]
@@ -473,99 +347,63 @@ class Librarian(gym.Env):
                     self._placingInventory[pos] = self.map[i]
                     toPlace -= 64
                     pos += 1
-        self._itemPos = {}
-        for items in self.map:
-            self._itemPos[items] = set()
-        self._chestContents = []
-        for chests in range(self.obs_size):
-            self._chestContents.append({})
-            for items in self.map:
-                self._chestContents[chests][items] = []
+            # Take the first item out of the simulated inventory, as the displayed inventory does
+            self._nextPlacingItem()
+        self._store.clear()
         self._inventory = {}
         self._nextOpen = 0
         self.obs[0][0][self.item] = 1
 
 
-        return self.obs.flatten()
+        return self._observation()
 
     def log(self):
         # Todo, store steps taken over the whole time, number of invalid actions taken, associate item
         #   with placement position
         # TODO Graph failureData, itemDistribution per hundered, moving averages
-        if self.episode_number % 100 == 0:
-            plt.clf()
-            plt.hist(self.returnData[self.episode_number - 100 + 1:self.episode_number])
-            plt.title('Reward Distribution at ' + str(self.episode_number))
-            plt.ylabel('Occurance')
-            plt.xlabel('Reward')
-            plt.savefig(f"{self.directory}/reward_histogram{str(self.episode_number)}.png")
-
-            plt.clf()
-            plt.hist(self.stepData[self.episode_number - 100 + 1:self.episode_number])
-            plt.title('Steps at ' + str(self.episode_number))
-            plt.ylabel('Occurance')
-            plt.xlabel('Steps')
-            plt.savefig(f"{self.directory}/step_histogram{str(self.episode_number)}.png")
-
-            # Save data
-            with open(f"{self.directory}/returnsfinalpart.json", 'w') as f:
-                toSave = {}
-                for step, value in enumerate(self.returnData[1:]):
-                    toSave[int(step)] = int(value)
-                json.dump(toSave, f)
-            with open(f"{self.directory}/stepData.json", 'w') as f:
-                toSave = {}
-                for step, value in enumerate(self.stepData[1:]):
-                    toSave[int(step)] = int(value)
-                json.dump(toSave, f)
-            with open(f"{self.directory}/failureData.json", 'w') as f:
-                toSave = {}
-                for step, value in enumerate(self.failureData[1:]):
-                    toSave[int(step)] = int(value)
-                json.dump(toSave, f)
-
-            plt.clf()
-            plt.bar(self.action_tracker.keys(), self.action_tracker.values())
-            plt.title('Action Distribution at ' + str(self.episode_number))
-            plt.ylabel('Occurance')
-            plt.xlabel('Action')
-            plt.savefig(f"{self.directory}/action_barchart{str(self.episode_number)}.png")
-            plt.clf()
-            items = [k for k, v in sorted(self.map.items(), key=lambda item: item[1])]
-            plt.yticks(ticks=numpy.arange(len(items)), labels=items)
-            plt.xticks(ticks=numpy.arange(self.obs_size), labels=range(1, self.obs_size + 1), rotation=90)
-            saved=plt.imshow(self.heatmap, cmap='Blues',interpolation="nearest")
-            plt.colorbar(saved)
-            plt.savefig(f"{self.directory}/heatmap{str(self.episode_number)}.png")
-
-            self.action_tracker = {}
+        # Only the data is gathered here, plots and files are written by the log writer (in the background)
+        full = self.episode_number % 100 == 0
+        new = {}
+        for name, history in (('returns', self.returnData), ('steps', self.stepData),
+                              ('failures', self.failureData)):
+            new[name] = history.drain()
+        new.update(self._smoothed)
+        self._smoothed = {name: [] for name in self._smoothed}
+        snapshot = {
+            'episode_number': self.episode_number,
+            'full': full,
+            'new': new,
+        }
+        if full:
+            snapshot['returnHistogram'] = self._returnHistogram.snapshot()
+            snapshot['stepHistogram'] = self._stepHistogram.snapshot()
+            snapshot['actions'] = self.action_tracker
+            snapshot['items'] = [k for k, v in sorted(self.map.items(), key=lambda item: item[1])]
+            snapshot['heatmap'] = self.heatmap
+
+            self._returnHistogram.clear()
+            self._stepHistogram.clear()
+            self.action_tracker = numpy.zeros(shape=self.obs_size + 1, dtype=numpy.int64)
             self.heatmap = numpy.zeros(shape=(len(self._env_items), self.obs_size))
+        self._logWriter.submit(snapshot)
 
-
-        box = numpy.ones(self._log_freq) / self._log_freq
-        returns_smooth = numpy.convolve(self.returnData[1:], box, mode='same')
-        plt.clf()
-        plt.plot(returns_smooth)
-        plt.title('Librarian')
-        plt.ylabel('Reward')
-        plt.xlabel('Episodes')
-        plt.savefig(f"{self.directory}/smooth_returns.png")
-
-        box = numpy.ones(self._log_freq) / self._log_freq
-        steps_smooth = numpy.convolve(self.stepData[1:], box, mode='same')
-        plt.clf()
-        plt.plot(steps_smooth)
-        plt.title('Librarian')
-        plt.ylabel('Steps')
-        plt.xlabel('Episodes')
-        plt.savefig(f"{self.directory}/steps_smooth.png")
-
-        plt.clf()
-        plt.plot(self.failureData)
-        plt.title('Librarian')
-        plt.ylabel('Failures')
-        plt.xlabel('Episodes')
-        plt.savefig(f"{self.directory}/failure_data.png")
+    def restore_mission(self):
+        """
+        Restore the running mission to its starting state with a few chat commands, instead of starting a new one.
+        Returns whether an observation of the restored state (starting inventory, agent at its start) arrived in time.
+        """
+        for command in reset_commands(self.obs_size, self._env_items):
+            self._commands.queue(f"chat {command}")
+        self.agent_position = 0
+        self._commands.flush()
+        # Observations sent before the commands took effect still show the last episode
+        restored = inventory_holds(start_inventory(self._env_items))
+        start = at(0.5, 0.5)
+        self._updateObs(lambda obs: restored(obs) and start(obs), self._reset_timeout)
+        if self._watcher.timed_out:
+            print("Mission not restored in time, starting a new one")
+            return False
+        return True
 
     def init_malmo(self):
         """
@@ -607,6 +445,9 @@ class Librarian(gym.Env):
 
 
 if __name__ == '__main__':
+    import ray
+    from ray.rllib.agents import ppo
+
     # ray.shutdown()
     ray.init()
     # Max request items, valid items, difficulty level
@@ -628,6 +469,8 @@ if __name__ == '__main__':
     return_path = None
     step_path = None
     failure_path = None
+    # Directory of a metrics store (e.g. "PATHTO\\library\\logs2") to resume the histories from instead of the JSON
+    store_path = None
 
     log_number = ""
     MAX_ITEMS = 5
@@ -658,13 +501,23 @@ if __name__ == '__main__':
     if failure_path is not None:
         with open(failure_path) as json_file:
             failureData = [i for i in json.load(json_file).values()]
+    if store_path is not None:
+        # The store does not hold the first entry of each history, pad it back
+        store = MetricsStore(store_path)
+        returnData = [0] + store.load('returns').tolist()
+        stepData = [0] + store.load('steps').tolist()
+        failureData = [0] + store.load('failures').tolist()
     env = {
         'items': {'stone': 128, 'diamond': 64, 'glass': 64, 'ladder': 128, 'brick': 64, 'dragon_egg': 128 * 3},
         'mapping': {'stone': 0, 'diamond': 1, 'glass': 2, 'ladder': 3, 'brick': 4, 'dragon_egg': 5},
         'rmapping': {0: 'stone', 1: 'diamond', 2: 'glass', 3: 'ladder', 4: 'brick', 5: 'dragon_egg'},
         'chestNum': 10,
         'max_per_chest': 3,
-        'directoryName': log_number,
+        # Absolute, rollout workers do not necessarily share the driver's working directory
+        'directoryName': os.path.abspath(log_number),
+        # 'malmo' to train against a running Minecraft client, 'headless' for pure in-process simulation
+        'backend': 'headless',
+        'planner': 'greedy',
         '_display': False,
         '_print_logs': False,
         '_sleep_interval': 0,
@@ -697,11 +550,14 @@ if __name__ == '__main__':
     else:
         env['requester'] = Requester(None, None, None, req_path)
 
+    # Rollout workers, one per spare core. Malmo drives a single Minecraft client so it keeps to the driver
+    NUM_WORKERS = max(1, (os.cpu_count() or 1) - 1) if env['backend'] == 'headless' else 0
+
     trainer = ppo.PPOTrainer(env=Librarian, config={
         'env_config': env,  # No environment parameters to configure
         'framework': 'torch',  # Use pyotrch instead of tensorflow
         'num_gpus': 0,  # We aren't using GPUs
-        'num_workers': 0  # We aren't using parallelism
+        'num_workers': NUM_WORKERS  # Every worker logs to its own directory (log_number/worker<i>)
     })
 
     if lib_path is not None:
@@ -712,12 +568,17 @@ if __name__ == '__main__':
         while True:
             i += 1
             print(trainer.train(), "TRAINING")
+            if NUM_WORKERS:
+                # Gather the metrics of the workers in the run's own store
+                merge(env['directoryName'])
             if i % 100 == 0:
                 print(f"LIBRARIAN SAVED AT: {trainer.save(log_number)}")
                 print(f"REQUESTER SAVED AT: {env['requester'].save_requester(log_number + '/requester.json')}")
                 # TODO, change this to save the failure to json file and loading there, or something along those lines
                 print(env['_stochasticFailure'])
     finally:
+        if NUM_WORKERS:
+            merge(env['directoryName'])
         print(f"LIBRARIAN SAVED AT: {trainer.save(log_number)}")
         print(f"REQUESTER SAVED AT: {env['requester'].save_requester(log_number + '/requester.json')}")
         # TODO, change this to save the failure to json file and loading there, or something along those lines
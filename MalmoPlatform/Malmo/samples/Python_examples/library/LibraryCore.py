@@ -0,0 +1,145 @@
+"""
+    Movement, chest and retrieval actions shared by the Librarian environment and the benchmark, so both retrieve
+    through the same planner, costs and commands
+"""
+from MissionBuilder import mission_xml
+from ObservationWatcher import chest_open, slots_swapped
+
+# Times a chest that did not open is used again before giving up
+OPEN_RETRIES = 2
+
+
+class LibraryCore:
+    """
+        Mixin, the class using it sets:
+            agent, _display, _print_logs, _commands (CommandBatcher), _watcher (ObservationWatcher), _swap_timeout
+            obs_size, _env_items, _costs (CostModel), _planner (RetrievalPlanner), _stochasticFailure
+            _store (ChestStore), _inventory, _nextOpen, agent_position
+    """
+    def _optimal_retrieve(self, input: dict):
+        """
+            input: dict of objects to retrieve in format of {key: object_id, value: number to retrieve}
+            Assumed that self._store holds the contents of the chests
+        """
+        if self._print_logs:
+            print(self._store.contents())
+        action_plan, result = self._planner.plan(input, self._store, self._stochasticFailure)
+        score = 0
+        for position, query in action_plan:
+            # Should be in order from closest to furthest and retreiving the items so we should be able to execute
+            #   from here
+            score += self.moveToChest(position + 1)
+            score += self.openChest()
+            self.getItems(query)
+            score += self.closeChest()
+        score += self.moveToChest(0)
+        if self._display:
+            score += self.openChest()
+            # Max position item should be at
+            self.invActions("swap", [(i, i) for i in range(self._nextOpen)])
+            score += self.closeChest()
+        self._commands.flush()
+        return result, score
+
+    def GetMissionXML(self):
+        return mission_xml(self.obs_size, self._env_items)
+
+    def _updateObs(self, condition=None, timeout=None):
+        """
+            Wait for a new observation meeting condition (see ObservationWatcher.wait)
+        """
+        if not self._display:
+            return
+        self.world_obs = self._watcher.wait(condition, timeout)
+
+    # Primative move actions, queued until the next flush
+    def moveLeft(self, steps, force):
+        if self._display or force:
+            self._commands.queue("moveeast", steps)
+        return steps
+
+    def moveRight(self, steps, force):
+        if self._display or force:
+            self._commands.queue("movewest", steps)
+        return steps
+
+    def openChest(self):
+        if self._display:
+            self._commands.queue("use 1")
+            self._commands.queue("use 0")
+        return self._costs.open_cost
+
+    def closeChest(self):
+        if self._display:
+            self._commands.queue("movenorth", 10)
+            self._commands.queue("movesouth", 10)
+        return self._costs.close_cost
+
+    # Complex Move actions
+    def moveToChest(self, chest_num, force=False):
+
+        if self.agent_position == chest_num:
+            return 0
+        if chest_num != -1 and self._print_logs:
+            print(f"Moving to chest #{chest_num} ..")
+        if self.agent_position - chest_num < 0:
+            result = self.moveLeft(self._costs.move(self.agent_position, chest_num), force)
+        else:
+            result = self.moveRight(self._costs.move(self.agent_position, chest_num), force)
+        self.agent_position = chest_num
+        if force and not self._display:
+            self._commands.flush()
+        return result
+
+    def invAction(self, action, inv_index, chest_index):
+        self.invActions(action, [(inv_index, chest_index)])
+
+    def invActions(self, action, slots):
+        """
+            Send the queued moves, then one swap per (inventory slot, chest slot) pair as a single batch.
+            Only waits on observations for the chest to be open and for the batch to be applied, raises RuntimeError
+            if either is not observed in time rather than go on from a stale observation.
+        """
+        if not slots:
+            return
+        self._commands.flush()
+        self._updateObs(chest_open, self._swap_timeout)
+        for _ in range(OPEN_RETRIES):
+            if not self._watcher.timed_out:
+                break
+            # The chest did not open, use it again
+            self.openChest()
+            self._commands.flush()
+            self._updateObs(chest_open, self._swap_timeout)
+        if self._watcher.timed_out:
+            raise RuntimeError(f"Chest {self.agent_position} did not open within {self._swap_timeout}s")
+        chestName = self.world_obs["inventoriesAvailable"][-1]['name']
+        for inv_index, chest_index in slots:
+            self._commands.queue(f"{action}InventoryItems {inv_index} {chestName}:{chest_index}")
+        self._commands.flush()
+        # Applied once the last pair of slots shows the swap. Sending it again could undo a late swap, so give up
+        inv_index, chest_index = slots[-1]
+        self._updateObs(slots_swapped(self.world_obs, f"InventorySlot_{inv_index}",
+                                      f"container.{chestName}Slot_{chest_index}"), self._swap_timeout)
+        if self._watcher.timed_out:
+            raise RuntimeError(f"Swap of inventory slot {inv_index} and slot {chest_index} of chest "
+                               f"{self.agent_position} not observed within {self._swap_timeout}s")
+
+    def getItems(self, query):
+        """
+            query = dict{ key = itemId: value = number to retrieve }
+        """
+        chest = self.agent_position - 1
+        swaps = []
+        for itemId, toRetrieve in query.items():
+            # Plans are made from the same store, so the chest always holds what is asked
+            for posToGet in self._store.take(chest, itemId, toRetrieve):
+                # Create a new slot for this new item, and deposit there
+                if itemId not in self._inventory:
+                    self._inventory[itemId] = set()
+                self._inventory[itemId].add(self._nextOpen)
+                swaps.append((self._nextOpen, posToGet))
+                self._nextOpen += 1
+        # Every swap of this chest in one batch
+        if self._display:
+            self.invActions("swap", swaps)
@@ -0,0 +1,115 @@
+"""
+    Background writer for the Librarian logs, plots and saved histories are produced off the training thread
+"""
+import atexit
+import queue
+import threading
+
+import numpy
+
+from MetricsStore import MetricsStore
+
+
+def _plot(path, title, ylabel, xlabel, draw):
+    # Figure objects (not pyplot) keep no global state, so plots can be rendered from any thread, always with Agg
+    from matplotlib.figure import Figure
+    figure = Figure()
+    axes = figure.subplots()
+    draw(figure, axes)
+    axes.set_title(title)
+    axes.set_ylabel(ylabel)
+    axes.set_xlabel(xlabel)
+    figure.savefig(path)
+
+
+def _curve(store, name, points=2000):
+    # Plot at most `points` values of the history, read from the memory mapped store
+    values = store.load(name)
+    stride = max(1, len(values) // points)
+    return numpy.arange(0, len(values), stride), values[::stride]
+
+
+def write_logs(directory, snapshot, store):
+    """
+        Render the plots of one Librarian.log snapshot and append its new episodes to the metrics store
+    """
+    episode = snapshot['episode_number']
+    # Save data, only what was not saved yet
+    for name, values in snapshot['new'].items():
+        store.append(name, values)
+    if not snapshot.get('plot', True):
+        return
+
+    if snapshot['full']:
+        def histogram(counts, edges):
+            return lambda figure, axes: axes.bar(edges[:-1], counts, width=numpy.diff(edges), align='edge')
+
+        _plot(f"{directory}/reward_histogram{str(episode)}.png", 'Reward Distribution at ' + str(episode),
+              'Occurance', 'Reward', histogram(*snapshot['returnHistogram']))
+        _plot(f"{directory}/step_histogram{str(episode)}.png", 'Steps at ' + str(episode),
+              'Occurance', 'Steps', histogram(*snapshot['stepHistogram']))
+
+        actions = snapshot['actions']
+        _plot(f"{directory}/action_barchart{str(episode)}.png", 'Action Distribution at ' + str(episode),
+              'Occurance', 'Action', lambda figure, axes: axes.bar(numpy.arange(1, len(actions)), actions[1:]))
+
+        def heatmap(figure, axes):
+            items = snapshot['items']
+            chests = snapshot['heatmap'].shape[1]
+            axes.set_yticks(numpy.arange(len(items)))
+            axes.set_yticklabels(items)
+            axes.set_xticks(numpy.arange(chests))
+            axes.set_xticklabels(range(1, chests + 1), rotation=90)
+            saved = axes.imshow(snapshot['heatmap'], cmap='Blues', interpolation="nearest")
+            figure.colorbar(saved)
+        _plot(f"{directory}/heatmap{str(episode)}.png", '', '', '', heatmap)
+
+    _plot(f"{directory}/smooth_returns.png", 'Librarian', 'Reward', 'Episodes',
+          lambda figure, axes: axes.plot(*_curve(store, 'smoothReturns')))
+    _plot(f"{directory}/steps_smooth.png", 'Librarian', 'Steps', 'Episodes',
+          lambda figure, axes: axes.plot(*_curve(store, 'smoothSteps')))
+    _plot(f"{directory}/failure_data.png", 'Librarian', 'Failures', 'Episodes',
+          lambda figure, axes: axes.plot(*_curve(store, 'failures')))
+
+
+class LogWriter:
+    def __init__(self, directory, asynchronous=True):
+        self.directory = directory
+        self.store = MetricsStore(directory)
+        self._queue = queue.Queue()
+        self._thread = None
+        if asynchronous:
+            self._thread = threading.Thread(target=self._run, name='LibrarianLogWriter', daemon=True)
+            self._thread.start()
+            # Write whatever is still queued when training stops
+            atexit.register(self.close)
+
+    def submit(self, snapshot):
+        if self._thread is None:
+            write_logs(self.directory, snapshot, self.store)
+        else:
+            self._queue.put(snapshot)
+
+    def _run(self):
+        while True:
+            snapshot = self._queue.get()
+            try:
+                if snapshot is None:
+                    return
+                write_logs(self.directory, snapshot, self.store)
+            except Exception as e:
+                print(f"Failed to write logs of episode {snapshot['episode_number']}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """
+            Block until every submitted snapshot is written
+        """
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
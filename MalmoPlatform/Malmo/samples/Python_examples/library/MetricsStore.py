@@ -0,0 +1,148 @@
+"""
+    Append-only metric histories. Every metric is a file of fixed width float64 records (<name>.f64), new episodes are
+    appended and the files can be memory mapped for analysis.
+"""
+import json
+import os
+import sys
+
+import numpy
+
+
+class MetricsStore:
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, name):
+        return os.path.join(self.directory, f"{name}.f64")
+
+    def length(self, name):
+        try:
+            return os.path.getsize(self.path(name)) // numpy.dtype(numpy.float64).itemsize
+        except FileNotFoundError:
+            return 0
+
+    def append(self, name, values):
+        values = numpy.asarray(values, dtype=numpy.float64)
+        if len(values) == 0:
+            return
+        with open(self.path(name), 'ab') as f:
+            values.tofile(f)
+
+    def load(self, name, mmap=True):
+        """
+            The whole history of a metric, memory mapped (read only) unless mmap is False. Only complete records are
+            read, a writer may still be appending the last one
+        """
+        length = self.length(name)
+        if length == 0:
+            return numpy.zeros(shape=0, dtype=numpy.float64)
+        if mmap:
+            return numpy.memmap(self.path(name), dtype=numpy.float64, mode='r', shape=(length,))
+        return numpy.fromfile(self.path(name), dtype=numpy.float64, count=length)
+
+
+class MetricBuffer:
+    def __init__(self, capacity, spill, initial=(), stored=0):
+        """
+            Typed ring buffer holding the latest `capacity` values of a metric, values not stored yet are passed to
+            spill (e.g. to be appended to a MetricsStore) before they would be overwritten.
+            initial: values to start with, the first `stored` of them are already stored
+        """
+        self.capacity = capacity
+        self._spill = spill
+        self._values = numpy.zeros(shape=capacity, dtype=numpy.float64)
+        # Values appended and values stored (or spilled) since the beginning
+        self._count = 0
+        self._stored = stored
+        for value in initial:
+            self.append(value)
+
+    def __len__(self):
+        return self._count
+
+    def append(self, value):
+        if self._count - self._stored >= self.capacity:
+            self.flush()
+        self._values[self._count % self.capacity] = value
+        self._count += 1
+
+    def _ordered(self, start):
+        return self._values[numpy.arange(start, self._count) % self.capacity]
+
+    def recent(self):
+        """
+            The values still held, oldest first
+        """
+        return self._ordered(max(0, self._count - self.capacity))
+
+    def drain(self):
+        """
+            The values not stored yet, which are then considered stored
+        """
+        pending = self._ordered(max(self._stored, self._count - self.capacity))
+        self._stored = max(self._stored, self._count)
+        return pending
+
+    def flush(self):
+        pending = self.drain()
+        if len(pending):
+            self._spill(pending)
+
+
+def worker_directory(directory, worker_index, vector_index=0):
+    """
+        Directory under directory of the store of one rollout worker (and sub-environment of that worker)
+    """
+    name = f"worker{worker_index}" if vector_index == 0 else f"worker{worker_index}_{vector_index}"
+    return os.path.join(directory, name)
+
+
+def merge(directory, sources=None, names=None):
+    """
+        Append the records of the worker stores in sources (default every worker directory under directory) not merged
+        yet to the store in directory. How much of every source was merged is kept in merged.json, returns the number
+        of records merged
+    """
+    if sources is None:
+        sources = sorted(os.path.join(directory, d) for d in os.listdir(directory)
+                         if d.startswith('worker') and os.path.isdir(os.path.join(directory, d)))
+    offsets_path = os.path.join(directory, 'merged.json')
+    offsets = {}
+    if os.path.exists(offsets_path):
+        with open(offsets_path) as f:
+            offsets = json.load(f)
+    store = MetricsStore(directory)
+    merged = 0
+    for source in sources:
+        source_store = MetricsStore(source)
+        source_offsets = offsets.setdefault(os.path.basename(source), {})
+        source_names = names if names is not None else \
+            sorted(name[:-len('.f64')] for name in os.listdir(source) if name.endswith('.f64'))
+        for name in source_names:
+            start = source_offsets.get(name, 0)
+            values = source_store.load(name)[start:]
+            store.append(name, values)
+            source_offsets[name] = start + len(values)
+            merged += len(values)
+    with open(offsets_path, 'w') as f:
+        json.dump(offsets, f)
+    return merged
+
+
+def convert_json(json_path, directory, name):
+    """
+        Append a history saved in the former {index: value} JSON format (e.g. returnsfinalpart.json) to the store in
+        directory, returns the number of records converted
+    """
+    with open(json_path) as json_file:
+        data = json.load(json_file)
+    values = [value for _, value in sorted(data.items(), key=lambda x: int(x[0]))]
+    MetricsStore(directory).append(name, values)
+    return len(values)
+
+
+if __name__ == '__main__':
+    # python MetricsStore.py <history.json> <store directory> <metric name>
+    #   e.g. python MetricsStore.py data/benchmarkGBest/returnsfinalpart.json data/benchmarkGBest returns
+    print(f"Converted {convert_json(sys.argv[1], sys.argv[2], sys.argv[3])} records")
@@ -0,0 +1,134 @@
+"""
+    Mission XML of the library, built once per (number of chests, items) configuration
+"""
+from functools import lru_cache
+
+
+def mission_xml(chest_num, items):
+    """
+        chest_num: number of chests
+        items: dict of items to distribute, key = item; value = number of item
+    """
+    return _mission_xml(chest_num, tuple(items.items()))
+
+
+def start_inventory(items):
+    """
+        (item, quantity) of every slot of the agent's starting inventory from the first one, stacks of at most 64
+    """
+    return _start_inventory(tuple(items.items()))
+
+
+def reset_commands(chest_num, items):
+    """
+        Chat commands restoring a running mission to its starting state: empty chests, the items back in the agent's
+        inventory and the agent back at its start
+    """
+    return _reset_commands(chest_num, tuple(items.items()))
+
+
+@lru_cache(maxsize=None)
+def _start_inventory(items):
+    stacks = []
+    for item, count in items:
+        while count > 0:
+            stacks.append((item, min(count, 64)))
+            count -= 64
+    return tuple(stacks)
+
+
+@lru_cache(maxsize=None)
+def _reset_commands(chest_num, items):
+    commands = []
+    # Replacing a chest with air and back drops nothing and leaves it empty
+    for x in [0] + [chest * 2 + 2 for chest in range(chest_num)]:
+        commands.append(f"/setblock {x} 2 1 minecraft:air")
+        commands.append(f"/setblock {x} 2 1 minecraft:chest")
+    commands.append("/clear @p")
+    for slot, (item, quantity) in enumerate(_start_inventory(items)):
+        # Inventory slots 0-8 are the hotbar, the rest the main inventory
+        target = f"slot.hotbar.{slot}" if slot < 9 else f"slot.inventory.{slot - 9}"
+        commands.append(f"/replaceitem entity @p {target} minecraft:{item} {quantity}")
+    commands.append("/tp @p 0.5 3 0.5 0 40")
+    return tuple(commands)
+
+
+@lru_cache(maxsize=None)
+def _mission_xml(chest_num, items):
+    leftX = chest_num * 2 + 2
+    libraryEnv = "".join([
+        f"<DrawCuboid x1='{leftX}' y1='0' z1='2' x2='-4' y2='10' z2='2' type='bookshelf' />",
+        f"<DrawCuboid x1='-4' y1='0' z1='2' x2='-4' y2='10' z2='-10' type='bookshelf' />",
+        f"<DrawCuboid x1='{leftX}' y1='0' z1='2' x2='{leftX}' y2='10' z2='-10' type='bookshelf' />",
+        f"<DrawCuboid x1='{leftX}' y1='0' z1='-10' x2='-4' y2='10' z2='-10' type='bookshelf' />",
+        f"<DrawCuboid x1='{leftX}' y1='1' z1='-10' x2='-4' y2='1' z2='2' type='bookshelf' />",
+    ])
+
+    # Items start in the agent's inventory as stacks of 64, one element per stack rather than one per item
+    inventory = "".join(f"<InventoryItem slot='{slot}' type='{item}' quantity='{quantity}' />"
+                        for slot, (item, quantity) in enumerate(_start_inventory(items)))
+
+    chests = [f"<DrawBlock x='0' y='2' z='1' type='air' />", f"<DrawBlock x='0' y='2' z='1' type='chest' />"]
+    for chest in range(chest_num):
+        chests.append(f"<DrawBlock x='{chest * 2 + 2}' y='2' z='1' type='air' />")
+        chests.append(f"<DrawBlock x='{chest * 2 + 2}' y='2' z='1' type='chest' />")
+        chests.append(f"<DrawBlock x='{chest * 2 + 2}' y='1' z='0' type='diamond_block' />")
+    chests.append(f"<DrawBlock x='0' y='2' z='1' type='chest' />")
+    chests = "".join(chests)
+
+    return f'''<?xml version="1.0" encoding="UTF-8" standalone="no" ?>
+                        <Mission xmlns="http://ProjectMalmo.microsoft.com" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+
+                            <About>
+                                <Summary>Librarian</Summary>
+                            </About>
+
+                            <ServerSection>
+                                <ServerInitialConditions>
+                                    <Time>
+                                        <StartTime>12000</StartTime>
+                                        <AllowPassageOfTime>false</AllowPassageOfTime>
+                                    </Time>
+                                    <Weather>clear</Weather>
+                                </ServerInitialConditions>
+                                <ServerHandlers>
+                                    <FlatWorldGenerator generatorString="3;7,2;1;"/>
+                                    <DrawingDecorator>
+                                        {libraryEnv}
+                                        {chests}
+                                        <DrawBlock x='-2' y='1' z='0' type='iron_block' />
+                                        <DrawBlock x='0' y='1' z='0' type='emerald_block' />
+                                    </DrawingDecorator>
+                                    <ServerQuitWhenAnyAgentFinishes/>
+                                </ServerHandlers>
+                            </ServerSection>
+
+                            <AgentSection mode="Survival">
+                                <Name>Librarian</Name>
+                                <AgentStart>
+                                    <Placement x="0.5" y="3" z="0.5" pitch="40" yaw="0"/>
+                                    <Inventory>
+                                        {inventory}
+                                    </Inventory>
+                                </AgentStart>
+                                <AgentHandlers>
+                                    <ContinuousMovementCommands/>
+                                    <DiscreteMovementCommands/>
+                                    <ChatCommands/>
+                                    <ObservationFromFullStats/>
+                                    <InventoryCommands/>
+                                    <ObservationFromFullInventory/>
+                                    <ObservationFromRay/>
+                                    <ObservationFromGrid>
+                                        <Grid name="floorAll">
+                                            <min x="-{int(chest_num / 2)}" y="-1" z="-{int(chest_num / 2)}"/>
+                                            <max x="{int(chest_num / 2)}" y="0" z="{int(chest_num / 2)}"/>
+                                        </Grid>
+                                    </ObservationFromGrid>
+                                    <AgentQuitFromTouchingBlockType>
+                                        <Block type="iron_block"/>
+                                    </AgentQuitFromReachingPosition>
+
+                                </AgentHandlers>
+                            </AgentSection>
+                        </Mission>'''
@@ -0,0 +1,67 @@
+"""
+    Decoding of the flat inventory observations of Malmo into arrays of item ids and counts per slot. The observation
+    keys of every inventory (e.g. "InventorySlot_3_item", "container.chestSlot_3_size") are built once per inventory
+    name and size.
+"""
+from functools import lru_cache
+
+import numpy
+
+PLAYER_INVENTORY_SIZE = 41
+
+
+@lru_cache(maxsize=None)
+def slot_keys(name, size):
+    """
+        (item keys, size keys) of every slot of an inventory, name None for the player's own inventory
+    """
+    prefix = "InventorySlot_" if name is None else f"container.{name}Slot_"
+    return tuple(f"{prefix}{i}_item" for i in range(size)), tuple(f"{prefix}{i}_size" for i in range(size))
+
+
+class ObservationDecoder:
+    def __init__(self, mapping=None):
+        """
+            mapping: dict of item to id, unknown items (and air) decode to -1. Without a mapping ids are given to
+                items as they are first seen, self.items maps them back.
+        """
+        self._grow = mapping is None
+        self.map = {} if mapping is None else mapping
+        self.items = [item for item, _ in sorted(self.map.items(), key=lambda x: x[1])]
+
+    def _id(self, item):
+        if item in self.map:
+            return self.map[item]
+        if not self._grow or item == 'air':
+            return -1
+        self.map[item] = len(self.items)
+        self.items.append(item)
+        return self.map[item]
+
+    def _decode(self, obs, name, size):
+        item_keys, size_keys = slot_keys(name, size)
+        ids = numpy.fromiter((self._id(obs.get(key, 'air')) for key in item_keys), dtype=numpy.int64, count=size)
+        counts = numpy.fromiter((obs.get(key, 0) for key in size_keys), dtype=numpy.int64, count=size)
+        return ids, counts
+
+    def inventory(self, obs):
+        """
+            (ids, counts) of the player's inventory slots
+        """
+        available = obs.get("inventoriesAvailable", [])
+        return self._decode(obs, None, available[0]['size'] if available else PLAYER_INVENTORY_SIZE)
+
+    def container(self, obs):
+        """
+            (ids, counts) of the slots of the open container, None if no container is open
+        """
+        available = obs.get("inventoriesAvailable", [])
+        if len(available) < 2:
+            return None
+        return self._decode(obs, available[-1]['name'], available[-1]['size'])
+
+    def decode(self, obs):
+        """
+            Both the player's inventory and the open container, see inventory and container
+        """
+        return self.inventory(obs), self.container(obs)
@@ -0,0 +1,105 @@
+"""
+    Waiting on Malmo observations. The world state is polled at a fixed short interval until an observation satisfies
+    the caller's condition, and how long every wait took is recorded.
+"""
+import json
+import time
+
+from ObservationDecoder import PLAYER_INVENTORY_SIZE, slot_keys
+
+
+def chest_open(obs):
+    # The player's inventory is always available, a second inventory means a container is open
+    return len(obs.get("inventoriesAvailable", [])) > 1
+
+
+def stack(obs, slot):
+    """
+        (item, quantity) held by the slot (observation key prefix, e.g. "InventorySlot_0" or "container.chestSlot_3")
+    """
+    return obs.get(f"{slot}_item", 'air'), obs.get(f"{slot}_size", 0)
+
+
+def slot_changed(obs, slot):
+    """
+        Condition met once the slot no longer holds the item and quantity it holds in obs, e.g. after a combine
+    """
+    before = stack(obs, slot)
+    return lambda obs: stack(obs, slot) != before
+
+
+def slots_swapped(obs, first, second):
+    """
+        Condition met once the slots first and second (observation key prefixes, e.g. "InventorySlot_0" and
+        "container.chestSlot_3") hold each other's item and quantity in obs, at once if they held the same
+    """
+    swapped = stack(obs, second), stack(obs, first)
+    return lambda obs: (stack(obs, first), stack(obs, second)) == swapped
+
+
+def inventory_holds(stacks):
+    """
+        Condition met once no container is open and the player's inventory holds exactly stacks, (item, quantity) of
+        every slot from the first one, the other slots empty
+    """
+    item_keys, size_keys = slot_keys(None, PLAYER_INVENTORY_SIZE)
+    expected = list(stacks) + [('air', 0)] * (PLAYER_INVENTORY_SIZE - len(stacks))
+
+    def condition(obs):
+        if chest_open(obs):
+            return False
+        for item_key, size_key, (item, quantity) in zip(item_keys, size_keys, expected):
+            if obs.get(item_key, 'air') != item or (item != 'air' and obs.get(size_key) != quantity):
+                return False
+        return True
+    return condition
+
+
+def at(x, z):
+    """
+        Condition met once the agent stands at (x, z)
+    """
+    return lambda obs: obs.get("XPos") == x and obs.get("ZPos") == z
+
+
+class ObservationWatcher:
+    def __init__(self, agent, interval=.05):
+        self.agent = agent
+        self.interval = interval
+        # Last observation received
+        self.latest = None
+        # Duration of the last wait, total time spent waiting and number of waits
+        self.last_wait = 0.0
+        self.total_wait = 0.0
+        self.waits = 0
+        self.timed_out = False
+
+    def poll(self):
+        """
+            Parse the newest observation received since the last poll, None if there is none
+        """
+        world_state = self.agent.getWorldState()
+        if len(world_state.observations) == 0:
+            return None
+        self.latest = json.loads(world_state.observations[-1].text)
+        return self.latest
+
+    def wait(self, condition=None, timeout=None):
+        """
+            Wait for a new observation meeting condition (any new observation if None), giving up after timeout
+            seconds if given. Returns the latest observation, check self.timed_out for whether it meets condition.
+        """
+        start = time.time()
+        self.timed_out = False
+        while True:
+            obs = self.poll()
+            if obs is not None and (condition is None or condition(obs)):
+                break
+            if timeout is not None and time.time() - start >= timeout:
+                self.timed_out = True
+                break
+            time.sleep(self.interval)
+        self.last_wait = time.time() - start
+        self.total_wait += self.last_wait
+        self.waits += 1
+        return self.latest
@@ -0,0 +1,44 @@
+"""
+    Constant time per episode statistics for the training curves, snapshotted when the logs are written
+"""
+from collections import deque
+
+import numpy
+
+
+class RunningMean:
+    def __init__(self, window):
+        # Mean of the last `window` values
+        self.window = window
+        self._values = deque()
+        self._total = 0.0
+
+    def update(self, value):
+        self._values.append(value)
+        self._total += value
+        if len(self._values) > self.window:
+            self._total -= self._values.popleft()
+        return self.mean
+
+    @property
+    def mean(self):
+        return self._total / len(self._values) if self._values else 0.0
+
+
+class StreamingHistogram:
+    def __init__(self, low, high, bins):
+        # Fixed bins over [low, high], values outside fall in the first or last bin
+        self.edges = numpy.linspace(low, high, bins + 1)
+        self._low = low
+        self._width = (high - low) / bins
+        self.counts = numpy.zeros(shape=bins, dtype=numpy.int64)
+
+    def update(self, value):
+        index = int((value - self._low) // self._width)
+        self.counts[min(max(index, 0), len(self.counts) - 1)] += 1
+
+    def snapshot(self):
+        return self.counts.copy(), self.edges
+
+    def clear(self):
+        self.counts[:] = 0
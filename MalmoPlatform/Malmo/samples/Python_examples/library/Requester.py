@@ -3,6 +3,9 @@ import time
 from pathlib import Path
 
 import json
+from math import comb
+
+import numpy
 
 
 class Requester:
@@ -14,6 +17,9 @@ class Requester:
     # { randoM) < .4  stone, < .8, diamond, < 1, fence }
     # get
     # complexity level 0 == single request, constant distribution
+    # Reward for fully retrieving a request, before the step penalty
+    successReward = 150
+
     def __init__(self, max_req, available_input, complexity_level, file_path=None):
         print(file_path)
         if file_path is not None:
@@ -31,6 +37,7 @@ class Requester:
 
             self.failedReward = {i: lambda x: x * -10 for i in self._items}
             self.stepWeights = lambda x: x * -1
+            self._cache_distribution()
             return
 
         # Max num requests to provide
@@ -63,8 +70,14 @@ class Requester:
             randomNums[-1] = 1
 
             self.probDist = [(self._items[i], randomNums[i]) for i in range(len(available_input))]
+        self._cache_distribution()
         return
 
+    def _cache_distribution(self):
+        # Cumulative probabilities of self.probDist as an array, and the cap of each of its items, for batched draws
+        self._cumulative = numpy.array([j[1] for j in self.probDist], dtype=numpy.float64)
+        self._caps = numpy.array([self.available[j[0]] for j in self.probDist], dtype=numpy.int64)
+
     def get_request(self):
         # .4 diamond, .6 stone
         # law large numbers [ average ]
@@ -84,9 +97,60 @@ class Requester:
                     break
         return request
 
+    def get_requests(self, n, mapping=None, rng=None):
+        """
+            Draw n requests at once, same distribution as get_request.
+            Returns a (n, number of items) count matrix, columns indexed by mapping (item -> column) if given, else
+            in the order of self._items
+        """
+        if mapping is None:
+            mapping = {item: i for i, item in enumerate(self._items)}
+        width = max(mapping.values()) + 1
+        columns = numpy.array([mapping[j[0]] for j in self.probDist], dtype=numpy.int64)
+        random_source = numpy.random if rng is None else rng
+
+        # Inverse CDF, the first item whose cumulative probability is above the draw, as in get_request
+        draws = numpy.searchsorted(self._cumulative, random_source.random((n, self.max_req)), side='right')
+        rows = numpy.repeat(numpy.arange(n), self.max_req)
+        draws = draws.ravel()
+        # Draws above the last cumulative probability select nothing
+        valid = draws < len(self.probDist)
+        drawn = numpy.bincount(rows[valid] * len(self.probDist) + draws[valid],
+                               minlength=n * len(self.probDist)).reshape((n, len(self.probDist)))
+        # Never request more stacks of an item than are available
+        drawn = numpy.minimum(drawn, self._caps)
+
+        requests = numpy.zeros((n, width), dtype=numpy.int64)
+        requests[:, columns] = drawn
+        return requests
+
+    def expected_counts(self):
+        """
+            Exact expected number of stacks of each item in a request. Each of the max_req draws picks an item with
+            its probability p in probDist, so the item's count is Binomial(max_req, p), then capped by its available
+            stacks.
+        """
+        expected = {}
+        previous = 0
+        for item, cumulative in self.probDist:
+            p = max(0.0, min(cumulative, 1) - previous)
+            previous = max(previous, min(cumulative, 1))
+            cap = self.available[item]
+            expected[item] = sum(min(x, cap) * comb(self.max_req, x) * p ** x * (1 - p) ** (self.max_req - x)
+                                 for x in range(self.max_req + 1))
+        return expected
+
+    def request_distribution(self):
+        """
+            Expected share of each requested item among all the items requested, only items that can be requested
+        """
+        expected = self.expected_counts()
+        total = sum(expected.values())
+        return {item: count / total for item, count in expected.items() if count > 0}
+
     def get_reward(self, request, response, steps, to_print=False):
         # TODO add stochastic here for rewards
-        reward = 150
+        reward = self.successReward
         failed = 0
         if to_print:
             print(f"REWARD REQUESTED FROM {request} {response} {steps}")
@@ -98,6 +162,18 @@ class Requester:
             return 0, failed
         return reward + self.stepWeights(steps), failed
 
+    def get_rewards(self, requests, responses, steps):
+        """
+            Batched get_reward, for many episodes at once and without changing the inputs.
+            requests, responses: (n, number of items) count arrays with the same columns (e.g. get_requests with the
+                env mapping)
+            steps: (n,) steps taken per episode
+            Returns the (n,) arrays of rewards and of the number of requested items not retrieved
+        """
+        failed = (numpy.asarray(requests) - numpy.asarray(responses)).sum(axis=1)
+        rewards = numpy.where(failed != 0, 0, self.successReward + self.stepWeights(numpy.asarray(steps)))
+        return rewards, failed
+
     def save_requester(self, path=None):
         # Given a path, save requester at that location (saving self.max_req, self.available, self._items).
         #   Optional parameter of location,
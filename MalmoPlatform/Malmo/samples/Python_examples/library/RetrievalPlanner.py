@@ -0,0 +1,108 @@
+"""
+    Retrieval planning shared by the Librarian and the benchmarks
+"""
+import heapq
+from random import random
+
+# greedy: farthest chest first per item, as the Librarian always did; exact: fewest steps for the whole request
+PLANNER_MODES = ('greedy', 'exact')
+
+
+class RetrievalPlanner:
+    def __init__(self, mode='greedy', costs=None):
+        if mode not in PLANNER_MODES:
+            raise ValueError(f"Unknown planner mode '{mode}', expected one of {PLANNER_MODES}")
+        if mode == 'exact' and (costs is None or not costs.is_linear):
+            raise ValueError("The exact planner needs the CostModel of a linear library")
+        self.mode = mode
+        self._costs = costs
+
+    def plan(self, request, store, failure):
+        """
+            request: dict of objects to retrieve in format of {key: object_id, value: number to retrieve}
+            store: ChestStore of the contents of the chests, or anything with its chests and count
+            failure: per chest, probability of failing to open it
+
+            Returns the action plan as a list of (chest, {key: object_id, value: number to retrieve}) ordered by
+            chest, and the dict of {key: object_id, value: number retrieved}
+        """
+        if self.mode == 'exact':
+            return self._plan_exact(request, store, failure)
+        return self._plan_greedy(request, store, failure)
+
+    def _plan_greedy(self, request, store, failure):
+        per_item = []
+        result = {}
+        for item_id, num_retrieve in request.items():
+            actions = []
+            chests = store.chests(item_id)
+            # Farthest chest first, until the request for this item is met
+            for toConsider in reversed(chests):
+                if num_retrieve <= 0:
+                    break
+                if random() < failure[toConsider]:
+                    continue
+                toRetrieve = min(num_retrieve, store.count(toConsider, item_id))
+                actions.append((toConsider, {item_id: toRetrieve}))
+                result[item_id] = result.get(item_id, 0) + toRetrieve
+                num_retrieve -= toRetrieve
+            # Each item's actions are descending by chest, reversed they merge into one ordered plan in a single pass
+            actions.reverse()
+            per_item.append(actions)
+        return list(heapq.merge(*per_item, key=lambda x: x[0])), result
+
+    def _plan_exact(self, request, store, failure):
+        """
+            Minimum step pickup set on the line of chests. Which chests fail to open is drawn once per chest, then a
+            dynamic program over the chests (nearest first) and the counts still required finds the fewest chests to
+            open for every farthest chest, and the cheapest walk + openings overall is kept. If the request cannot be
+            met, as much of it as possible is retrieved.
+        """
+        items = [item_id for item_id, num_retrieve in request.items() if num_retrieve > 0]
+        candidates = sorted({chest for item_id in items for chest in store.chests(item_id)})
+        candidates = [chest for chest in candidates if random() >= failure[chest]]
+        holding = {chest: tuple(store.count(chest, item_id) for item_id in items)
+                   for chest in candidates}
+        needs = [min(request[item_id], sum(held[i] for held in holding.values())) for i, item_id in enumerate(items)]
+
+        # On a line, the walk only depends on the farthest chest visited
+        round_trips = dict(zip(candidates, self._costs.round_trip(candidates).tolist()))
+
+        zero = tuple(0 for _ in items)
+        # key = counts still required; value = (chests opened, linked list of the chests opened)
+        states = {tuple(needs): (0, None)}
+        best = (0, None) if tuple(needs) == zero else None
+        for chest in candidates:
+            held = holding[chest]
+            for remaining, (opened, path) in list(states.items()):
+                # Taking as much as possible from an opened chest never costs extra steps
+                after = tuple(max(0, left - have) for left, have in zip(remaining, held))
+                if after == remaining:
+                    continue
+                if after not in states or opened + 1 < states[after][0]:
+                    states[after] = (opened + 1, (chest, path))
+            if zero in states:
+                cost = round_trips[chest] + self._costs.visit_cost * states[zero][0]
+                if best is None or cost < best[0]:
+                    best = (cost, states[zero][1])
+
+        chosen = []
+        path = best[1] if best is not None else None
+        while path is not None:
+            chosen.append(path[0])
+            path = path[1]
+        chosen.reverse()
+
+        action_plan = []
+        result = {}
+        remaining = list(needs)
+        for chest in chosen:
+            query = {}
+            for i, item_id in enumerate(items):
+                toRetrieve = min(remaining[i], holding[chest][i])
+                if toRetrieve > 0:
+                    query[item_id] = toRetrieve
+                    result[item_id] = result.get(item_id, 0) + toRetrieve
+                    remaining[i] -= toRetrieve
+            action_plan.append((chest, query))
+        return action_plan, result
@@ -30,12 +30,20 @@ except ImportError:
 import os
 import sys
 import time
-import json
 import matplotlib.pyplot as plt
 from numpy.random import randint
 
+from ObservationWatcher import ObservationWatcher, chest_open, slot_changed, slots_swapped, stack
+from ObservationDecoder import ObservationDecoder
+
 agent_position = 0
 num_moves = 0
+watchers = {}
+# Seconds to wait for the effect of chest uses and inventory actions, times a chest that did not open is used again
+TIMEOUT = 1
+OPEN_RETRIES = 2
+# Item ids are given as items are seen, decoder.items maps them back to names
+decoder = ObservationDecoder()
 
 
 def GetMissionXML(obs_size):
@@ -102,17 +110,20 @@ def GetMissionXML(obs_size):
                     </Mission>'''
 
 
-def getObs(arg_agent):
-    toSleep = .1
-    obs = {}
-    while obs == {}:
-        time.sleep(toSleep)
-        toSleep += .2
-        try:
-            cur_state = arg_agent.getWorldState()
-            obs = json.loads(cur_state.observations[-1].text)
-        except IndexError:
-            print("retrying...")
+def getObs(arg_agent, condition=None, timeout=None):
+    # One watcher per agent, watchers[id(arg_agent)].last_wait is how long the last observation took
+    if id(arg_agent) not in watchers:
+        watchers[id(arg_agent)] = ObservationWatcher(arg_agent)
+    return watchers[id(arg_agent)].wait(condition, timeout)
+
+
+def waitFor(arg_agent, condition, what):
+    """
+        Observation meeting condition, raises if none does within TIMEOUT
+    """
+    obs = getObs(arg_agent, condition, TIMEOUT)
+    if watchers[id(arg_agent)].timed_out:
+        raise RuntimeError(f"{what} not observed within {TIMEOUT}s")
     return obs
 
 
@@ -168,6 +179,21 @@ def openChest(arg_agent):
     arg_agent.sendCommand("use 0")
 
 
+def waitChestOpen(arg_agent):
+    """
+        Observation of the chest just used once it is open, the chest is used again if it did not open
+    """
+    obs = getObs(arg_agent, chest_open, TIMEOUT)
+    for _ in range(OPEN_RETRIES):
+        if not watchers[id(arg_agent)].timed_out:
+            break
+        openChest(arg_agent)
+        obs = getObs(arg_agent, chest_open, TIMEOUT)
+    if watchers[id(arg_agent)].timed_out:
+        raise RuntimeError(f"Chest {agent_position} did not open within {TIMEOUT}s")
+    return obs
+
+
 def closeChest(arg_agent):
     for _ in range(10):
         arg_agent.sendCommand("movenorth")
@@ -177,20 +203,12 @@ def closeChest(arg_agent):
 
 
 def getItemsInChest(arg_agent):
-    items = {}
-    obs = getObs(arg_agent)
-    chestName = obs["inventoriesAvailable"][-1]['name']
-    chestSize = obs["inventoriesAvailable"][-1]['size']
-    for i in range(chestSize):
-        if f"container.{chestName}Slot_{i}_item" in obs:
-            item = obs[f"container.{chestName}Slot_{i}_item"]
-            if item == 'air':
-                continue
-            if item not in items:
-                items[item] = 0
-            items[item] += obs[f"container.{chestName}Slot_{i}_size"]
-
-    return items
+    chest = decoder.container(getObs(arg_agent))
+    if chest is None:
+        return {}
+    ids, counts = chest
+    totals = numpy.bincount(ids[ids >= 0], weights=counts[ids >= 0], minlength=len(decoder.items))
+    return {decoder.items[i]: int(totals[i]) for i in numpy.flatnonzero(totals)}
 
 
 def printItemsInDict(items):
@@ -209,31 +227,33 @@ def invAction(arg_agent, action, inv_index, chest_index, obs=None):
 
 
 def getItems(arg_agent, searching, inventoryNeeds, ordersMet):
-    obs = getObs(arg_agent)
-    chestName = obs["inventoriesAvailable"][-1]['name']
-    chestSize = obs["inventoriesAvailable"][-1]['size']
-    for i in range(chestSize):
-
-        obs = getObs(arg_agent)
-        if f"container.{chestName}Slot_{i}_item" in obs:
-            item = obs[f"container.{chestName}Slot_{i}_item"]
-            itemHad = obs[f"container.{chestName}Slot_{i}_size"]
-
-            if item == 'air':
-                continue
-            if item in searching and len(searching[item]) != 0:
-                inventoryNeeds[searching[item][-1]][1] -= itemHad
-                time.sleep(.2)
-                print(int(obs[f"InventorySlot_{searching[item][-1]}_size"]))
-                invAction(arg_agent,
-                          "combine" if int(obs[f"InventorySlot_{searching[item][-1]}_size"]) != 0 else "swap",
-                          searching[item][-1], i, obs=obs)
-                if inventoryNeeds[searching[item][-1]][1] == 0:
-                    ordersMet += 1
-                    if len(searching[item]) == 1:
-                        del searching[item][-1]
-                    else:
-                        searching[item].pop()
+    # Every combine/swap is computed from one observation of the chest, the inventory slot sizes are tracked locally
+    obs = waitChestOpen(arg_agent)
+    (_, inventorySizes), (ids, counts) = decoder.decode(obs)
+    chestName = obs['inventoriesAvailable'][-1]['name']
+    moved = None
+    for i in numpy.flatnonzero(ids >= 0):
+        item, itemHad = decoder.items[ids[i]], int(counts[i])
+        if item in searching and len(searching[item]) != 0:
+            slot = searching[item][-1]
+            inventoryNeeds[slot][1] -= itemHad
+            action = "combine" if inventorySizes[slot] != 0 else "swap"
+            invAction(arg_agent, action, slot, i, obs=obs)
+            inventorySizes[slot] += itemHad
+            moved = action, slot, i
+            if inventoryNeeds[slot][1] == 0:
+                ordersMet += 1
+                searching[item].pop()
+    # Only observe again once commands were sent, until the last chest slot moved is updated. A swap is with an empty
+    #   inventory slot, a combine leaves part of the stack or nothing in the chest slot
+    if moved is not None:
+        action, slot, i = moved
+        chestSlot = f"container.{chestName}Slot_{i}"
+        if action == "swap":
+            waitFor(arg_agent, slots_swapped(obs, f"InventorySlot_{slot}", chestSlot),
+                    f"Swap into inventory slot {slot}")
+        else:
+            waitFor(arg_agent, slot_changed(obs, chestSlot), f"Combine into inventory slot {slot}")
     return searching, inventoryNeeds, ordersMet
 
 
@@ -253,26 +273,27 @@ def bruteForceRetrieve(arg_agent, values: dict, size):
     ordersMet = 0
     for i in range(1, size):
         moveToChest(arg_agent, i)
-        time.sleep(.5)
         openChest(arg_agent)
-        time.sleep(.5)
+        # Retrieve all items into the spaces, as needed (getItems waits for the chest to open)
         toFill, inventoryNeeds, ordersMet = getItems(arg_agent, toFill, inventoryNeeds, ordersMet)
-        # Retrieve all items into the spaces, as needed
-        time.sleep(.5)
         closeChest(arg_agent)
-        time.sleep(.5)
+        waitFor(arg_agent, lambda obs: not chest_open(obs), f"Closing chest {i}")
         if len(inventoryNeeds) == ordersMet:
             break
     moveToChest(arg_agent, 0)
-    time.sleep(.5)
-    obs = getObs(arg_agent)
     openChest(arg_agent)
-    time.sleep(.2)
+    obs = waitChestOpen(arg_agent)
+    chestName = obs['inventoriesAvailable'][-1]['name']
     for i in range(27):
         invAction(arg_agent, "swap", i, i, obs=obs)
-        time.sleep(.2)
+    # Confirmed by the last pair of slots the swaps change, slots both empty stay the same
+    changed = [i for i in range(27) if stack(obs, f"InventorySlot_{i}") != stack(obs, f"container.{chestName}Slot_{i}")]
+    if changed:
+        last = changed[-1]
+        waitFor(arg_agent, slots_swapped(obs, f"InventorySlot_{last}", f"container.{chestName}Slot_{last}"),
+                f"Swap of inventory slot {last} into the delivery chest")
     closeChest(arg_agent)
-    time.sleep(.2)
+    waitFor(arg_agent, lambda obs: not chest_open(obs), "Closing the delivery chest")
 
 
 # Testing and enviornment
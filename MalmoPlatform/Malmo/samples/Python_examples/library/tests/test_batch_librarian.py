@@ -0,0 +1,67 @@
+import random
+
+import numpy
+import pytest
+
+gym = pytest.importorskip("gym")
+
+from BatchLibrarian import BatchLibrarian
+from Librarian import Librarian
+from test_librarian import headless_config
+
+REQUEST = {'stone': 2, 'diamond': 1, 'dragon_egg': 3}
+
+
+def fixed_request(config):
+    # Both environments are asked for the same request every episode
+    mapping = config['mapping']
+    requester = config['requester']
+    requester.get_request = lambda: dict(REQUEST)
+
+    def get_requests(n, mapping=mapping, rng=None):
+        requests = numpy.zeros(shape=(n, len(mapping)), dtype=numpy.int64)
+        for item, num in REQUEST.items():
+            requests[:, mapping[item]] = num
+        return requests
+    requester.get_requests = get_requests
+    return config
+
+
+@pytest.mark.parametrize('planner', ['greedy', 'exact'])
+def test_matches_the_librarian(tmp_path, planner):
+    chest_num = 10
+    actions = random.Random(5).choices(range(chest_num), k=3000)
+    failure = [0.7805985575324255, 0.010020667324609045, 0.618243240812539, 0.06541976810436156,
+               0.014450713025995533, 0.05572127466323378, 0.04338720075449303, 0.007890235534481071,
+               0.01715813232043357, 0.30471561338685693]
+
+    random.seed(1)
+    env = Librarian(fixed_request(headless_config(tmp_path, chest_num, planner=planner,
+                                                  _stochasticFailure=failure)))
+    # No plots, they are most of the time of a headless episode
+    env._log_freq = len(actions) + 1
+    expected = [env.reset()]
+    for action in actions:
+        obs, reward, done, _ = env.step(action)
+        expected.append((obs, reward, done))
+        if done:
+            expected.append(env.reset())
+
+    random.seed(1)
+    batch = BatchLibrarian(fixed_request(headless_config(tmp_path, chest_num, planner=planner,
+                                                         _stochasticFailure=failure)), 1)
+    assert (batch.reset()[0] == expected.pop(0)).all()
+    episodes = 0
+    for action in actions:
+        obs, reward, done, info = batch.step(numpy.array([action]))
+        lib_obs, lib_reward, lib_done = expected.pop(0)
+        assert reward[0] == lib_reward
+        assert done[0] == lib_done
+        if done[0]:
+            episodes += 1
+            # The batch starts the next episode right away, the observation that ended it is in info
+            assert (info[0]['terminal_observation'] == lib_obs).all()
+            assert (obs[0] == expected.pop(0)).all()
+        else:
+            assert (obs[0] == lib_obs).all()
+    assert episodes > 100
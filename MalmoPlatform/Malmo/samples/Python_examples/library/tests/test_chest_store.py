@@ -0,0 +1,80 @@
+import random
+
+import numpy
+
+from ChestStore import ChestStore, EMPTY
+
+
+def test_more_chests_than_a_machine_word():
+    store = ChestStore(130, 3, ['stone', 'glass'])
+    for chest in (0, 63, 64, 129):
+        store.place(chest, 0, 'stone')
+    store.place(129, 1, 'glass')
+    assert store.chests('stone') == [0, 63, 64, 129]
+    assert store.chests('glass') == [129]
+
+    assert store.take(64, 'stone', 1) == [0]
+    assert store.chests('stone') == [0, 63, 129]
+    assert store.slots[64, 0] == EMPTY
+
+
+def test_free_slot_is_the_first_empty_slot():
+    store = ChestStore(2, 4, ['stone', 'glass'])
+    assert store.free_slot(0) == 0
+    for slot, item in enumerate(['stone', 'glass', 'stone', 'glass']):
+        store.place(0, slot, item)
+    assert store.free_slot(0) is None
+    assert store.free_slot(1) == 0
+
+    # Last slots first
+    assert store.take(0, 'stone', 1) == [2]
+    assert store.free_slot(0) == 2
+    assert store.take(0, 'glass', 5) == [3, 1]
+    assert store.free_slot(0) == 1
+    assert store.count(0, 'stone') == 1
+    assert store.count(0, 'glass') == 0
+
+
+def check_consistent(store):
+    # Every bitmask and the one-hot encoding agree with the slots
+    for item, item_id in store.ids.items():
+        chests = sorted({int(chest) for chest in numpy.nonzero(store.slots == item_id)[0]})
+        assert store.chests(item) == chests
+        for chest in range(len(store.slots)):
+            assert store.count(chest, item) == int((store.slots[chest] == item_id).sum())
+    for chest in range(len(store.slots)):
+        empty = numpy.flatnonzero(store.slots[chest] == EMPTY)
+        assert store.free_slot(chest) == (int(empty[0]) if len(empty) else None)
+    chests, slots = numpy.nonzero(store.slots != EMPTY)
+    assert store.onehot.sum() == len(chests)
+    assert (store.onehot[chests, slots, store.slots[chests, slots]] == 1).all()
+
+
+def test_place_take_snapshot_restore():
+    rng = random.Random(0)
+    items = ['stone', 'glass', 'brick']
+    store = ChestStore(70, 3, items, onehot=numpy.zeros(shape=(70, 3, 3)))
+    saved = None
+    for move in range(3000):
+        chest = rng.randrange(70)
+        if rng.random() < 0.6:
+            slot = store.free_slot(chest)
+            if slot is not None:
+                store.place(chest, slot, rng.choice(items))
+        else:
+            store.take(chest, rng.choice(items), rng.randrange(1, 3))
+        if move % 500 == 0:
+            check_consistent(store)
+            saved = store.snapshot(), store.slots.copy()
+    check_consistent(store)
+
+    snapshot, slots = saved
+    store.restore(snapshot)
+    assert (store.slots == slots).all()
+    check_consistent(store)
+    # The snapshot is not changed by what happens after it is restored
+    store.clear()
+    check_consistent(store)
+    store.restore(snapshot)
+    assert (store.slots == slots).all()
+    check_consistent(store)
@@ -0,0 +1,43 @@
+import pytest
+
+from CostModel import CostModel
+
+
+def old_move(position, destination):
+    # Librarian.moveToChest before the CostModel: 2 blocks between positions, nothing if already there
+    if position == destination:
+        return 0
+    return 2 * abs(position - destination)
+
+
+def old_tour(chests):
+    # moveToChest through the chest indices in ascending order, then back to the delivery chest
+    steps = 0
+    position = 0
+    for chest in sorted(chests):
+        steps += old_move(position, chest + 1)
+        position = chest + 1
+    return steps + old_move(position, 0)
+
+
+def test_move_matches_the_old_step_counting():
+    costs = CostModel(10)
+    for position in range(-1, 11):
+        for destination in range(-1, 11):
+            assert costs.move(position, destination) == old_move(position, destination)
+
+
+def test_tour_matches_the_old_step_counting():
+    costs = CostModel(10)
+    for chests in ([], [0], [9], [3, 1, 7], [2, 2, 5], list(range(10))):
+        assert costs.tour(chests) == old_tour(chests)
+    assert costs.round_trip([0, 4, 9]).tolist() == [old_tour([0]), old_tour([4]), old_tour([9])]
+
+
+def test_layout():
+    costs = CostModel(2, [(2, 0), (2, 3)])
+    assert not costs.is_linear
+    assert costs.move(1, 2) == 3
+    assert costs.tour([0, 1]) == 2 + 3 + 5
+    with pytest.raises(ValueError):
+        CostModel(3, [(2, 0), (4, 0)])
@@ -0,0 +1,47 @@
+import os
+import random
+
+import numpy
+import pytest
+
+gym = pytest.importorskip("gym")
+
+from ChestStore import EMPTY
+from Librarian import Librarian
+from Requester import Requester
+
+LIBRARY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ITEMS = {'stone': 128, 'diamond': 64, 'glass': 64, 'ladder': 128, 'brick': 64, 'dragon_egg': 128 * 3}
+
+
+def headless_config(directory, chest_num, max_per_chest=3, **kwargs):
+    config = {
+        'items': ITEMS,
+        'mapping': {item: i for i, item in enumerate(ITEMS)},
+        'rmapping': {i: item for i, item in enumerate(ITEMS)},
+        'chestNum': chest_num, 'max_per_chest': max_per_chest, 'directoryName': str(directory),
+        'backend': 'headless', '_async_log': False,
+        'returnData': [], 'stepData': [], 'itemData': {}, 'failureData': [],
+        '_stochasticFailure': [0.1] * chest_num,
+        'requester': Requester(None, None, None, os.path.join(LIBRARY, "requester.json")),
+    }
+    config.update(kwargs)
+    return config
+
+
+def test_hundreds_of_chests(tmp_path):
+    random.seed(0)
+    numpy.random.seed(0)
+    env = Librarian(headless_config(tmp_path, 150))
+    obs = env.reset()
+    assert obs.shape == env.observation_space.shape
+    done = False
+    for _ in range(1000):
+        obs, reward, done, _ = env.step(random.randrange(150))
+        if done:
+            break
+    assert done
+    # The observation still encodes exactly what the request left in the chests
+    chests, slots = numpy.nonzero(env._store.slots != EMPTY)
+    assert env.obs[1:].sum() == len(chests)
+    assert (env.obs[1:][chests, slots, env._store.slots[chests, slots]] == 1).all()
@@ -0,0 +1,70 @@
+import os
+
+import numpy
+
+from MetricsStore import MetricBuffer, MetricsStore, merge, worker_directory
+
+
+def test_buffer_spills_every_value_once():
+    spilled = []
+    buffer = MetricBuffer(4, spilled.extend)
+    for value in range(10):
+        buffer.append(value)
+    assert len(buffer) == 10
+    assert buffer.recent().tolist() == [6, 7, 8, 9]
+    # Values are spilled before they would be overwritten, the rest is drained
+    assert spilled + buffer.drain().tolist() == list(range(10))
+    assert len(buffer.drain()) == 0
+    buffer.append(10)
+    buffer.flush()
+    assert spilled == list(range(8)) + [10]
+
+
+def test_buffer_initial_values_already_stored():
+    spilled = []
+    buffer = MetricBuffer(3, spilled.extend, initial=[1, 2, 3, 4, 5], stored=4)
+    assert buffer.recent().tolist() == [3, 4, 5]
+    assert spilled == []
+    assert buffer.drain().tolist() == [5]
+
+
+def test_store_append_load(tmp_path):
+    store = MetricsStore(str(tmp_path))
+    assert store.load('returns').tolist() == []
+    store.append('returns', [1, 2])
+    store.append('returns', [])
+    store.append('returns', [3.5])
+    assert store.length('returns') == 3
+    assert store.load('returns').tolist() == [1, 2, 3.5]
+    assert store.load('returns', mmap=False).tolist() == [1, 2, 3.5]
+
+
+def test_load_skips_a_partial_record(tmp_path):
+    store = MetricsStore(str(tmp_path))
+    store.append('returns', [1, 2, 3.5])
+    # A record still being written is not read
+    with open(store.path('returns'), 'ab') as f:
+        f.write(b'\x00' * 3)
+    assert store.load('returns').tolist() == [1, 2, 3.5]
+    assert store.load('returns', mmap=False).tolist() == [1, 2, 3.5]
+
+
+def test_merge_appends_only_new_records(tmp_path):
+    directory = str(tmp_path)
+    workers = [worker_directory(directory, 1), worker_directory(directory, 2, 1)]
+    assert [os.path.basename(worker) for worker in workers] == ['worker1', 'worker2_1']
+    for worker in workers:
+        os.makedirs(worker)
+    MetricsStore(workers[0]).append('returns', [1, 2])
+    MetricsStore(workers[1]).append('returns', [3])
+    MetricsStore(workers[1]).append('steps', [30])
+
+    assert merge(directory) == 4
+    store = MetricsStore(directory)
+    assert store.load('returns').tolist() == [1, 2, 3]
+    assert store.load('steps').tolist() == [30]
+
+    MetricsStore(workers[0]).append('returns', [4])
+    assert merge(directory) == 1
+    assert merge(directory) == 0
+    assert numpy.array_equal(store.load('returns'), [1, 2, 3, 4])
@@ -0,0 +1,35 @@
+import re
+
+from MissionBuilder import mission_xml, reset_commands, start_inventory
+
+ITEMS = {'stone': 128, 'diamond': 64, 'glass': 64, 'ladder': 128, 'brick': 64, 'dragon_egg': 128 * 3}
+
+
+def test_start_inventory_stacks():
+    assert start_inventory({'dragon_egg': 384}) == (('dragon_egg', 64),) * 6
+    assert start_inventory({'stone': 100, 'glass': 64}) == (('stone', 64), ('stone', 36), ('glass', 64))
+    assert len(start_inventory(ITEMS)) == 13
+
+
+def test_mission_xml_starts_with_the_stacks():
+    xml = mission_xml(10, ITEMS)
+    stacks = re.findall(r"<InventoryItem slot='(\d+)' type='(\w+)' quantity='(\d+)' />", xml)
+    assert [(int(slot), item, int(quantity)) for slot, item, quantity in stacks] == \
+        [(slot, item, quantity) for slot, (item, quantity) in enumerate(start_inventory(ITEMS))]
+    # Items are no longer dropped into the world
+    assert "<DrawItem" not in xml
+    assert xml.count("type='diamond_block'") == 10
+
+
+def test_reset_commands():
+    commands = reset_commands(10, ITEMS)
+    # Every chest, the delivery chest (x = 0) included, is emptied
+    emptied = [int(x) for x in re.findall(r"/setblock (-?\d+) 2 1 minecraft:air", " ".join(commands))]
+    assert emptied == [0] + [chest * 2 + 2 for chest in range(10)]
+    for x in emptied:
+        assert f"/setblock {x} 2 1 minecraft:chest" in commands
+
+    replaced = [command.split()[3] for command in commands if command.startswith("/replaceitem")]
+    assert replaced == [f"slot.hotbar.{slot}" for slot in range(9)] + [f"slot.inventory.{slot}" for slot in range(4)]
+    assert "/replaceitem entity @p slot.inventory.3 minecraft:dragon_egg 64" in commands
+    assert commands.index("/clear @p") < commands.index("/replaceitem entity @p slot.hotbar.0 minecraft:stone 64")
@@ -0,0 +1,57 @@
+from ObservationDecoder import ObservationDecoder, PLAYER_INVENTORY_SIZE, slot_keys
+
+
+def observation(inventory, chest=None):
+    obs = {"inventoriesAvailable": [{'name': 'inventory', 'size': PLAYER_INVENTORY_SIZE}]}
+    for slot, (item, quantity) in enumerate(inventory):
+        obs[f"InventorySlot_{slot}_item"] = item
+        obs[f"InventorySlot_{slot}_size"] = quantity
+    if chest is not None:
+        obs["inventoriesAvailable"].append({'name': 'chest', 'size': 27})
+        for slot, (item, quantity) in enumerate(chest):
+            obs[f"container.chestSlot_{slot}_item"] = item
+            obs[f"container.chestSlot_{slot}_size"] = quantity
+    return obs
+
+
+def test_slot_keys():
+    item_keys, size_keys = slot_keys(None, 2)
+    assert item_keys == ("InventorySlot_0_item", "InventorySlot_1_item")
+    assert size_keys == ("InventorySlot_0_size", "InventorySlot_1_size")
+    item_keys, size_keys = slot_keys('chest', 27)
+    assert item_keys[3] == "container.chestSlot_3_item"
+    assert size_keys[26] == "container.chestSlot_26_size"
+
+
+def test_mapping():
+    decoder = ObservationDecoder({'stone': 0, 'glass': 1})
+    obs = observation([('glass', 64), ('air', 0), ('dirt', 5), ('stone', 12)], chest=[('stone', 3)])
+    ids, counts = decoder.inventory(obs)
+    assert len(ids) == len(counts) == PLAYER_INVENTORY_SIZE
+    # Unknown items and air are -1, slots missing from the observation are empty
+    assert ids[:5].tolist() == [1, -1, -1, 0, -1]
+    assert counts[:5].tolist() == [64, 0, 5, 12, 0]
+    ids, counts = decoder.container(obs)
+    assert len(ids) == 27
+    assert ids[:2].tolist() == [0, -1]
+    assert counts[:2].tolist() == [3, 0]
+
+
+def test_no_chest_open():
+    decoder = ObservationDecoder({'stone': 0})
+    obs = observation([('stone', 64)])
+    assert decoder.container(obs) is None
+    (ids, _), chest = decoder.decode(obs)
+    assert ids[0] == 0
+    assert chest is None
+
+
+def test_ids_given_on_first_sight():
+    decoder = ObservationDecoder()
+    obs = observation([('air', 0), ('glass', 1)], chest=[('stone', 5), ('glass', 7)])
+    (ids, _), (chest_ids, chest_counts) = decoder.decode(obs)
+    assert ids[:2].tolist() == [-1, 0]
+    assert chest_ids[:2].tolist() == [1, 0]
+    assert chest_counts[:2].tolist() == [5, 7]
+    assert decoder.items == ['glass', 'stone']
+    assert decoder.map == {'glass': 0, 'stone': 1}
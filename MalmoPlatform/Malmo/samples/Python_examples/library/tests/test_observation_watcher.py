@@ -0,0 +1,46 @@
+from ObservationWatcher import inventory_holds, at, slot_changed, slots_swapped
+
+
+def inventory(stacks, container=False):
+    obs = {"inventoriesAvailable": [{'name': 'inventory', 'size': 41}]}
+    if container:
+        obs["inventoriesAvailable"].append({'name': 'chest', 'size': 27})
+    for slot, (item, quantity) in enumerate(stacks):
+        obs[f"InventorySlot_{slot}_item"] = item
+        obs[f"InventorySlot_{slot}_size"] = quantity
+    return obs
+
+
+def test_inventory_holds_exactly_the_stacks():
+    restored = inventory_holds([('stone', 64), ('glass', 64)])
+    assert restored(inventory([('stone', 64), ('glass', 64)]))
+    assert restored(inventory([('stone', 64), ('glass', 64), ('air', 0)]))
+    # Stale observations of the last episode
+    assert not restored(inventory([('stone', 64), ('glass', 12)]))
+    assert not restored(inventory([('stone', 64), ('glass', 64), ('diamond', 3)]))
+    assert not restored(inventory([('stone', 64), ('glass', 64)], container=True))
+
+
+def test_at():
+    assert at(0.5, 0.5)({"XPos": 0.5, "ZPos": 0.5})
+    assert not at(0.5, 0.5)({"XPos": 8.5, "ZPos": 0.5})
+    assert not at(0.5, 0.5)({})
+
+
+def test_slot_changed_by_item_or_quantity():
+    before = inventory([('stone', 64)])
+    changed = slot_changed(before, "InventorySlot_0")
+    assert not changed(before)
+    # A partial combine keeps the item
+    assert changed(inventory([('stone', 12)]))
+    assert changed(inventory([]))
+
+
+def test_slots_swapped():
+    before = inventory([('air', 0), ('stone', 64)])
+    swapped = slots_swapped(before, "InventorySlot_0", "InventorySlot_1")
+    assert not swapped(before)
+    assert swapped(inventory([('stone', 64), ('air', 0)]))
+    assert not swapped(inventory([('stone', 12), ('air', 0)]))
+    # Two empty slots are swapped at once
+    assert slots_swapped(before, "InventorySlot_2", "InventorySlot_3")(before)
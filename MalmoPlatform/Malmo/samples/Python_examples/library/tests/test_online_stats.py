@@ -0,0 +1,34 @@
+import numpy
+
+from OnlineStats import RunningMean, StreamingHistogram
+
+VALUES = [0, 104, -5, 110, 0, 140, 102, 98.5, 0, 150, -120, 36, 104, 77, 400, 12]
+
+
+def test_running_mean_matches_convolve():
+    window = 4
+    mean = RunningMean(window)
+    assert mean.mean == 0.0
+    means = [mean.update(value) for value in VALUES]
+    # Mean of the values seen until the window is full, then the window slides and evicts the oldest value
+    assert numpy.allclose(means[:window], numpy.cumsum(VALUES[:window]) / numpy.arange(1, window + 1))
+    assert numpy.allclose(means[window - 1:], numpy.convolve(VALUES, numpy.ones(window) / window, mode='valid'))
+
+
+def test_histogram_matches_numpy():
+    histogram = StreamingHistogram(-100, 150, 25)
+    for value in VALUES:
+        histogram.update(value)
+    counts, edges = histogram.snapshot()
+    # Values outside [low, high] are counted in the first or last bin
+    expected, expected_edges = numpy.histogram(numpy.clip(VALUES, -100, 150), bins=25, range=(-100, 150))
+    assert numpy.array_equal(edges, expected_edges)
+    assert counts.tolist() == expected.tolist()
+    assert counts[0] == 1 and counts[-1] == 3
+
+    # The snapshot is a copy
+    histogram.clear()
+    assert histogram.counts.sum() == 0
+    assert counts.sum() == len(VALUES)
+    histogram.update(-100)
+    assert histogram.snapshot()[0].tolist() == [1] + [0] * 24
@@ -0,0 +1,83 @@
+import os
+import random
+from itertools import product
+
+import numpy
+
+import Requester as requester_module
+from Requester import Requester
+
+LIBRARY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def saved_requester():
+    return Requester(None, None, None, os.path.join(LIBRARY, "requester.json"))
+
+
+class FixedDraws:
+    """
+        Same uniform draws for get_request (random.random) and get_requests (rng.random)
+    """
+    def __init__(self, draws):
+        self.draws = draws
+        self._next = iter(draws.ravel().tolist())
+
+    def __call__(self):
+        return next(self._next)
+
+    def random(self, shape):
+        assert shape == self.draws.shape
+        return self.draws
+
+
+def test_get_requests_matches_get_request(monkeypatch):
+    req = saved_requester()
+    mapping = {item: i for i, item in enumerate(reversed(req._items))}
+    draws = FixedDraws(numpy.random.RandomState(0).random_sample((500, req.max_req)))
+    requests = req.get_requests(500, mapping, rng=draws)
+
+    monkeypatch.setattr(requester_module.random, 'random', draws)
+    for row in requests:
+        expected = numpy.zeros(shape=len(mapping), dtype=numpy.int64)
+        for item, num in req.get_request().items():
+            expected[mapping[item]] = num
+        assert row.tolist() == expected.tolist()
+
+
+def test_expected_counts_matches_every_draw():
+    req = saved_requester()
+    shares = []
+    previous = 0
+    for item, cumulative in req.probDist:
+        shares.append((item, cumulative - previous))
+        previous = cumulative
+    # Every sequence of max_req draws, with its probability, through the caps of get_request
+    expected = {item: 0.0 for item in req._items}
+    for draws in product(shares, repeat=req.max_req):
+        probability = numpy.prod([p for _, p in draws])
+        counts = {}
+        for item, _ in draws:
+            counts[item] = min(counts.get(item, 0) + 1, req.available[item])
+        for item, count in counts.items():
+            expected[item] += probability * count
+
+    counts = req.expected_counts()
+    for item in req._items:
+        assert numpy.isclose(counts[item], expected[item])
+    assert numpy.isclose(sum(req.request_distribution().values()), 1)
+
+
+def test_get_rewards_matches_get_reward():
+    req = saved_requester()
+    rng = random.Random(0)
+    requests = numpy.array([[rng.randrange(3) for _ in req._items] for _ in range(200)])
+    responses = numpy.array([[rng.randint(num - 1, num) if num else 0 for num in request] for request in requests])
+    steps = numpy.array([rng.randrange(10, 60) for _ in range(200)])
+    originals = requests.copy()
+
+    rewards, failed = req.get_rewards(requests, responses, steps)
+    for i in range(200):
+        request = {item: int(num) for item, num in zip(req._items, requests[i])}
+        response = {item: int(num) for item, num in zip(req._items, responses[i])}
+        assert (rewards[i], failed[i]) == req.get_reward(request, response, steps[i])
+    assert (requests == originals).all()
@@ -0,0 +1,78 @@
+import random
+from itertools import combinations
+
+import pytest
+
+from ChestStore import ChestStore
+from CostModel import CostModel
+from RetrievalPlanner import RetrievalPlanner
+
+ITEMS = ['stone', 'glass', 'brick']
+
+
+def random_store(rng, chest_num, slots_per_chest):
+    store = ChestStore(chest_num, slots_per_chest, ITEMS)
+    for chest in range(chest_num):
+        for slot in range(slots_per_chest):
+            if rng.random() < 0.6:
+                store.place(chest, slot, rng.choice(ITEMS))
+    return store
+
+
+def steps(costs, action_plan):
+    chests = [chest for chest, _ in action_plan]
+    return costs.tour(chests) + costs.visit_cost * len(chests)
+
+
+def brute_force(costs, request, store, failure):
+    """
+        Fewest steps of every set of chests that can be opened, retrieving as much of the request as possible
+    """
+    openable = [chest for chest in range(costs.chest_num) if failure[chest] < 1]
+    needs = {item: min(num, sum(store.count(chest, item) for chest in openable)) for item, num in request.items()}
+    best = None
+    for size in range(len(openable) + 1):
+        for chests in combinations(openable, size):
+            if all(sum(store.count(chest, item) for chest in chests) >= num for item, num in needs.items()):
+                cost = costs.tour(chests) + costs.visit_cost * size
+                best = cost if best is None else min(best, cost)
+    return best, {item: num for item, num in needs.items() if num > 0}
+
+
+def test_exact_matches_brute_force():
+    rng = random.Random(0)
+    costs = CostModel(7)
+    planner = RetrievalPlanner('exact', costs)
+    for _ in range(200):
+        store = random_store(rng, 7, 3)
+        request = {item: rng.randrange(4) for item in ITEMS}
+        # Chests fail always or never, so the draws do not change the answer
+        failure = [rng.choice([0, 0, 0, 1]) for _ in range(7)]
+        action_plan, result = planner.plan(request, store, failure)
+
+        best, retrievable = brute_force(costs, request, store, failure)
+        assert steps(costs, action_plan) == best
+        assert result == retrievable
+        assert [chest for chest, _ in action_plan] == sorted({chest for chest, _ in action_plan})
+        for chest, query in action_plan:
+            assert failure[chest] == 0
+            assert all(0 < num <= store.count(chest, item) for item, num in query.items())
+
+
+def test_greedy_takes_the_farthest_chests_first():
+    store = ChestStore(4, 3, ITEMS)
+    for chest in (0, 1, 3):
+        store.place(chest, 0, 'stone')
+    store.place(3, 1, 'stone')
+    action_plan, result = RetrievalPlanner().plan({'stone': 3}, store, [0] * 4)
+    assert action_plan == [(1, {'stone': 1}), (3, {'stone': 2})]
+    assert result == {'stone': 3}
+
+
+def test_modes():
+    with pytest.raises(ValueError):
+        RetrievalPlanner('fastest')
+    with pytest.raises(ValueError):
+        RetrievalPlanner('exact')
+    with pytest.raises(ValueError):
+        RetrievalPlanner('exact', CostModel(2, [(2, 0), (2, 3)]))